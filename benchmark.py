@@ -0,0 +1,234 @@
+# benchmark.py
+# Times the bank's data layer against a seeded temporary database and prints the results as JSON
+#   python benchmark.py --accounts 100000 --output before.json
+import argparse
+import contextlib
+import json
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import time
+
+import testbed
+
+#region Setup
+
+parser = argparse.ArgumentParser(description="Benchmarks bank operations against a seeded temporary SQLite database")
+parser.add_argument("--accounts", type=int, default=1000, help="Number of customer accounts to seed")
+parser.add_argument("--loans", type=int, default=None, help="Number of loans to seed (default: a tenth of the accounts)")
+parser.add_argument("--tickets", type=int, default=None, help="Number of accounts holding lottery tickets (default: a tenth of the accounts)")
+parser.add_argument("--iterations", type=int, default=1000, help="Timed calls per operation")
+parser.add_argument("--bulk-iterations", type=int, default=5, help="Timed calls for operations that touch every row, like the biweekly update")
+parser.add_argument("--only", nargs="*", default=None, help="Only run these operations")
+parser.add_argument("--seed", type=int, default=0, help="Random seed, so runs pick the same accounts")
+parser.add_argument("--output", default=None, help="Write the JSON report here instead of stdout")
+arguments = parser.parse_args()
+
+if arguments.loans is None:
+    arguments.loans = arguments.accounts // 10
+if arguments.tickets is None:
+    arguments.tickets = arguments.accounts // 10
+
+PASSWORD = "benchmark"
+
+bot, directory = testbed.import_bot("imc-benchmark-", PASSWORD)
+
+database = bot.database
+QUERIES = bot.QUERIES
+Money = bot.Money
+
+#endregion
+
+#region Seeding
+
+def seed(connection, accounts, loans, tickets, rng):
+    types = ["Checking", "Savings", "Business", "Government"]
+    limit = Money.denars(10**9)
+
+    with bot.transaction(connection):
+        testbed.seed_accounts(bot, connection, PASSWORD, ((f"account{i}", types[i % len(types)], Money.denars(rng.randint(100, 100000)), limit) for i in range(accounts)))
+        connection.executemany(
+            QUERIES["create_loan"],
+            ((f"account{rng.randrange(accounts)}", 0.05, Money.denars(10**6), Money.denars(10**6), "0", 0.1, Money.denars(5)) for _ in range(loans))
+        )
+        connection.executemany(
+            QUERIES["add_lottery_tickets"],
+            ((f"account{i}", rng.randint(1, 20)) for i in rng.sample(range(accounts), min(tickets, accounts)))
+        )
+    connection.execute("ANALYZE")
+
+#endregion
+
+#region Operations
+
+#Each operation takes the writer connection and a random generator and performs one call the bot would make
+def random_account(rng):
+    return f"account{rng.randrange(arguments.accounts)}"
+
+def random_loan(connection, rng):
+    return connection.execute("SELECT id, accountName FROM loans WHERE id >= ? ORDER BY id LIMIT 1", (rng.randint(1, arguments.loans),)).fetchone()
+
+def get_account_uncached(connection, rng):
+    name = random_account(rng)
+    bot.accountCache.invalidate(name)
+    bot.accountCache.finish_write()
+    bot.get_account(connection, name)
+
+def get_account_cached(connection, rng):
+    bot.get_account(connection, 'IMC')
+
+def get_loans(connection, rng):
+    bot.get_loans(connection, random_account(rng))
+
+def get_transactions(connection, rng):
+    bot.get_transactions(connection, random_account(rng), bot.HISTORY_PAGE_SIZE+1)
+
+def deposit(connection, rng):
+    return bot.execute_operation(connection, bot.deposit, random_account(rng), Money.denars(5), True)
+
+def withdraw(connection, rng):
+    return bot.execute_operation(connection, bot.withdraw, random_account(rng), Money.denars(5), True)
+
+def transfer(connection, rng):
+    return bot.execute_operation(connection, bot.transfer, random_account(rng), random_account(rng), Money.denars(5), True)
+
+def pay_loan(connection, rng):
+    loan = random_loan(connection, rng)
+    if loan is None:
+        return False
+    return bot.execute_operation(connection, bot.pay_loan, loan[1], loan[0], Money.denars(1))
+
+def grant_loan(connection, rng):
+    return bot.execute_operation(connection, bot.grant_loan, random_account(rng), 0.05, Money.denars(100), "0", 0.1, Money.denars(5))
+
+def buy_lottery_ticket(connection, rng):
+    return bot.execute_operation(connection, bot.buy_lottery_ticket, random_account(rng), 1)
+
+def draw_lottery_winner(connection, rng):
+    bot.draw_lottery_winner(connection)
+
+def treasury(connection, rng):
+    bot.execute_read_query(connection, QUERIES["get_treasury"])
+
+def leaderboard(connection, rng):
+    bot.execute_read_query(connection, QUERIES["get_leaderboard"], (bot.LEADERBOARD_MAX,))
+
+def check_password(connection, rng):
+    bot.check_password(PASSWORD, bot.get_account(connection, 'IMC').password)
+
+def biweekly_preview(connection, rng):
+    bot.execute_read_query(connection, QUERIES["preview_loan_interest"])
+    bot.execute_read_query(connection, QUERIES["preview_loan_notices"])
+    bot.execute_read_query(connection, QUERIES["preview_account_interest"])
+
+def biweekly_update(connection, rng):
+    return bot.execute_query_many(connection, [(QUERIES["apply_loan_interest"], ()), (QUERIES["record_account_interest"], ()), (QUERIES["apply_account_interest"], ())])
+
+def reset_daily_maximums(connection, rng):
+    return bot.execute_query(connection, QUERIES["reset_daily_maximums"])
+
+#Name, function, and whether it touches every row and so runs fewer times
+OPERATIONS = [
+    ("get_account", get_account_uncached, False),
+    ("get_account_cached", get_account_cached, False),
+    ("get_loans", get_loans, False),
+    ("get_transactions", get_transactions, False),
+    ("deposit", deposit, False),
+    ("withdraw", withdraw, False),
+    ("transfer", transfer, False),
+    ("pay_loan", pay_loan, False),
+    ("grant_loan", grant_loan, False),
+    ("buy_lottery_ticket", buy_lottery_ticket, False),
+    ("draw_lottery_winner", draw_lottery_winner, False),
+    ("treasury", treasury, False),
+    ("leaderboard", leaderboard, False),
+    ("check_password", check_password, False),
+    ("biweekly_preview", biweekly_preview, True),
+    ("biweekly_update", biweekly_update, True),
+    ("reset_daily_maximums", reset_daily_maximums, True),
+]
+
+#endregion
+
+#region Measurement
+
+def statements_executed():
+    return sum(bot.statementCache.executions.values())
+
+#Runs on the database's writer thread so every call sees the same connection the bot uses
+def measure(connection, function, iterations, rng):
+    timings = []
+    rejected = 0
+    statements = statements_executed()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = function(connection, rng)
+        timings.append(time.perf_counter() - start)
+        if result is False:
+            rejected += 1
+    statements = statements_executed() - statements
+    return timings, rejected, statements
+
+def summarize(timings, rejected, statements):
+    timings = [timing * 1_000_000 for timing in timings]
+    percentiles = statistics.quantiles(timings, n=100, method="inclusive") if len(timings) > 1 else timings * 99
+    return {
+        "iterations": len(timings),
+        "rejected": rejected,
+        "mean_us": round(statistics.fmean(timings), 2),
+        "p50_us": round(percentiles[49], 2),
+        "p95_us": round(percentiles[94], 2),
+        "p99_us": round(percentiles[98], 2),
+        "max_us": round(max(timings), 2),
+        "queries_per_op": round(statements / len(timings), 2),
+    }
+
+def main():
+    rng = random.Random(arguments.seed)
+    report = {
+        "config": {
+            "accounts": arguments.accounts,
+            "loans": arguments.loans,
+            "tickets": arguments.tickets,
+            "iterations": arguments.iterations,
+            "bulk_iterations": arguments.bulk_iterations,
+            "seed": arguments.seed,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "operations": {},
+    }
+
+    with contextlib.redirect_stdout(sys.stderr):
+        start = time.perf_counter()
+        database.run_blocking(seed, arguments.accounts, arguments.loans, arguments.tickets, rng)
+        report["seed_seconds"] = round(time.perf_counter() - start, 3)
+
+        for name, function, bulk in OPERATIONS:
+            if arguments.only is not None and name not in arguments.only:
+                continue
+            iterations = arguments.bulk_iterations if bulk else arguments.iterations
+            if iterations < 1:
+                continue
+            print(f"Benchmarking {name}", file=sys.stderr)
+            report["operations"][name] = summarize(*database.run_blocking(measure, function, iterations, rng))
+
+    shutil.rmtree(directory, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if arguments.output is None:
+        print(output)
+    else:
+        with open(arguments.output, "w") as file:
+            file.write(output + "\n")
+
+#endregion
+
+if __name__ == "__main__":
+    main()
@@ -5,10 +5,28 @@ import random
 import sqlite3
 import math
 import asyncio
+import sys
+import bisect
+import contextvars
+import json
+import logging
+import time
+import hashlib
+import hmac
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from logging.handlers import RotatingFileHandler
 from sqlite3 import Error
 from discord.ext import commands
 from dotenv import load_dotenv
 
+#The cogs import their shared state from this module as bot, so running it as a script must not load a second copy
+sys.modules.setdefault("bot", sys.modules[__name__])
+
 #region Setup
 
 #region Connect to Discord
@@ -23,82 +41,453 @@ prefix = '-'
 bot = commands.Bot(command_prefix=prefix, intents=intents)
 #endregion
 
+#region Metrics
+
+#Upper bounds of the command latency histogram in seconds, the same defaults the Prometheus client libraries use
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf)
+
+#Name of the command being run, so database work and Discord API calls made on its behalf are counted against it
+#Approvals, scheduled jobs and other work outside a command are counted as background
+currentCommand = contextvars.ContextVar("currentCommand", default="background")
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    #Only the bucket is known, so this returns the upper bound of the bucket the quantile falls in
+    def quantile(self, q):
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= q * self.count:
+                return bound
+        return self.buckets[-1]
+
+#Counters are updated from the event loop and the database threads, so every update takes the lock
+class Metrics:
+    def __init__(self, buckets):
+        self.started = time.time()
+        self.latency = defaultdict(partial(Histogram, buckets))
+        self.errors = Counter()
+        self.statements = Counter()
+        self.databaseSeconds = Counter()
+        self.apiCalls = Counter()
+        self.apiErrors = Counter()
+        self.lock = threading.Lock()
+        self.task = None
+
+    def observe_command(self, command, seconds):
+        with self.lock:
+            self.latency[command].observe(seconds)
+
+    def record_error(self, command, error):
+        with self.lock:
+            self.errors[command, error] += 1
+
+    def record_statement(self):
+        command = currentCommand.get()
+        with self.lock:
+            self.statements[command] += 1
+
+    def record_database(self, seconds):
+        command = currentCommand.get()
+        with self.lock:
+            self.databaseSeconds[command] += seconds
+
+    def record_api_call(self, route, failed):
+        command = currentCommand.get()
+        with self.lock:
+            self.apiCalls[command, route] += 1
+            if failed:
+                self.apiErrors[route] += 1
+
+    #Per command totals for the stats command, busiest first
+    def summary(self):
+        with self.lock:
+            names = set(self.latency) | set(self.statements) | {command for command, error in self.errors}
+            errors = Counter()
+            for (command, error), count in self.errors.items():
+                errors[command] += count
+            apiCalls = Counter()
+            for (command, route), count in self.apiCalls.items():
+                apiCalls[command] += count
+            rows = []
+            for command in names:
+                histogram = self.latency.get(command)
+                runs = histogram.count if histogram else 0
+                rows.append({
+                    "command": command,
+                    "runs": runs,
+                    "errors": errors[command],
+                    "mean": histogram.sum / runs if runs else 0,
+                    "p95": histogram.quantile(0.95) if runs else 0,
+                    "statements": self.statements[command],
+                    "databaseSeconds": self.databaseSeconds[command],
+                    "apiCalls": apiCalls[command],
+                })
+            routes = Counter()
+            for (command, route), count in self.apiCalls.items():
+                routes[route] += count
+            return sorted(rows, key=lambda row: (row["runs"], row["statements"]), reverse=True), routes, Counter(self.apiErrors)
+
+    #Prometheus text exposition format, for node_exporter's textfile collector
+    def render(self):
+        lines = []
+
+        def metric(name, kind, help, samples):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                labelString = ",".join(f'{key}="{escape_label(str(label))}"' for key, label in labels.items())
+                lines.append(f"{name}{suffix}{{{labelString}}} {value}" if labelString else f"{name}{suffix} {value}")
+
+        with self.lock:
+            histograms = []
+            for command, histogram in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    histograms.append(("_bucket", {"command": command, "le": "+Inf" if bound == math.inf else bound}, cumulative))
+                histograms.append(("_sum", {"command": command}, histogram.sum))
+                histograms.append(("_count", {"command": command}, histogram.count))
+
+            metric("imc_command_duration_seconds", "histogram", "Time taken to run each command", histograms)
+            metric("imc_command_errors_total", "counter", "Commands that raised an error, by error type",
+                   [("", {"command": command, "error": error}, count) for (command, error), count in sorted(self.errors.items())])
+            metric("imc_db_statements_total", "counter", "SQL statements executed on behalf of each command",
+                   [("", {"command": command}, count) for command, count in sorted(self.statements.items())])
+            metric("imc_db_seconds_total", "counter", "Time spent on the database threads on behalf of each command",
+                   [("", {"command": command}, seconds) for command, seconds in sorted(self.databaseSeconds.items())])
+            metric("imc_discord_api_calls_total", "counter", "Discord HTTP API requests, by command and route",
+                   [("", {"command": command, "route": route}, count) for (command, route), count in sorted(self.apiCalls.items())])
+            metric("imc_discord_api_errors_total", "counter", "Discord HTTP API requests that failed, by route",
+                   [("", {"route": route}, count) for route, count in sorted(self.apiErrors.items())])
+
+        metric("imc_statement_cache_hits_total", "counter", "SQL statements served from the prepared statement cache", [("", {}, statementCache.hits)])
+        metric("imc_statement_cache_misses_total", "counter", "SQL statements that had to be compiled", [("", {}, statementCache.misses)])
+        metric("imc_account_cache_hits_total", "counter", "Account lookups served from memory", [("", {}, accountCache.hits)])
+        metric("imc_account_cache_misses_total", "counter", "Account lookups that went to the database", [("", {}, accountCache.misses)])
+        metric("imc_start_time_seconds", "gauge", "Unix time the bot started", [("", {}, self.started)])
+        return "\n".join(lines) + "\n"
+
+    #Written to a temporary file and renamed into place so the collector never reads a half-written file
+    def write_textfile(self, path):
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as file:
+            file.write(self.render())
+        os.replace(temporary, path)
+
+    async def export(self, path, interval):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.write_textfile, path)
+            except OSError as e:
+                print(f"The error '{e}' occurred")
+            await asyncio.sleep(interval)
+
+    def start_export(self, path, interval):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.export(path, interval))
+
+def escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+metrics = Metrics(LATENCY_BUCKETS)
+
+#Where to write the Prometheus textfile and how often. Nothing is written unless a path is set
+METRICS_PATH = os.getenv("METRICS_PATH")
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", "15"))
+
+#Every Discord REST call goes through HTTPClient.request, so wrapping it counts them all by route, like "POST /channels/{channel_id}/messages"
+def count_api_calls(http):
+    request = http.request
+
+    async def counted(route, **kwargs):
+        try:
+            response = await request(route, **kwargs)
+        except discord.HTTPException:
+            metrics.record_api_call(route.key, True)
+            raise
+        metrics.record_api_call(route.key, False)
+        return response
+
+    http.request = counted
+
+count_api_calls(bot.http)
+
+#endregion
+
 #region Connect to database
 
-def create_connection(path):
+#Size of sqlite3's per-connection prepared statement cache. It should be at least the number of distinct queries in QUERIES
+CACHED_STATEMENTS = int(os.getenv("DB_CACHED_STATEMENTS", "128"))
+
+#Mirrors sqlite3's LRU statement caches so admins can see how often statements are reused instead of recompiled
+#Every connection has its own cache and is only used from the thread that opened it, so each thread's cache is tracked separately
+class StatementCacheStats:
+    def __init__(self, size):
+        self.size = size
+        self.caches = {}
+        self.executions = Counter()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def record(self, query):
+        with self.lock:
+            self.executions[query] += 1
+            recent = self.caches.setdefault(threading.get_ident(), OrderedDict())
+            if query in recent:
+                recent.move_to_end(query)
+                self.hits += 1
+            else:
+                self.misses += 1
+                recent[query] = None
+                if len(recent) > self.size:
+                    recent.popitem(last=False)
+
+    def report(self):
+        with self.lock:
+            return self.hits, self.misses, [len(recent) for recent in self.caches.values()], self.executions.most_common(10)
+
+statementCache = StatementCacheStats(CACHED_STATEMENTS)
+
+#Size of the in-memory cache of recently read accounts
+ACCOUNT_CACHE_SIZE = int(os.getenv("ACCOUNT_CACHE_SIZE", "256"))
+
+#LRU cache of accounts by name. Temporary triggers on the writer connection report every changed row, which is dropped as soon as it changes
+#and again once the write finishes. Readers only store what they read if nothing was invalidated in the meantime, so a read racing a commit can't put a stale row back
+class AccountCache:
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.dirty = set()
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def lookup(self, name):
+        with self.lock:
+            account = self.entries.get(name)
+            if account is None:
+                self.misses += 1
+            else:
+                self.entries.move_to_end(name)
+                self.hits += 1
+            return account, self.version
+
+    def store(self, name, account, version):
+        with self.lock:
+            if version != self.version:
+                return
+            self.entries[name] = account
+            self.entries.move_to_end(name)
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, name):
+        with self.lock:
+            self.version += 1
+            self.dirty.add(name)
+            self.entries.pop(name, None)
+
+    def finish_write(self):
+        with self.lock:
+            if self.dirty:
+                self.version += 1
+                for name in self.dirty:
+                    self.entries.pop(name, None)
+                self.dirty.clear()
+
+accountCache = AccountCache(ACCOUNT_CACHE_SIZE)
+
+def watch_accounts(connection):
+    connection.create_function("account_changed", 1, accountCache.invalidate, deterministic=False)
+    connection.execute("CREATE TEMP TRIGGER account_cache_update AFTER UPDATE ON main.accounts BEGIN SELECT account_changed(old.name), account_changed(new.name); END")
+    connection.execute("CREATE TEMP TRIGGER account_cache_delete AFTER DELETE ON main.accounts BEGIN SELECT account_changed(old.name); END")
+
+#Opt-in SQL tracing. Statements slower than SLOW_QUERY_MS milliseconds, and statements that fail, are written to a rotating log with the command that ran them
+#Leaving it unset turns tracing off, and 0 logs every statement
+SLOW_QUERY_MS = os.getenv("SLOW_QUERY_MS")
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "slow_queries.log")
+SLOW_QUERY_LOG_BYTES = int(os.getenv("SLOW_QUERY_LOG_BYTES", str(10*1024*1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "5"))
+
+class QueryTracer:
+    def __init__(self, threshold, path, maxBytes, backups):
+        self.threshold = threshold
+        self.plans = {}
+        self.steps = threading.local()
+        self.logger = logging.getLogger("imc.sql")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        handler = RotatingFileHandler(path, maxBytes=maxBytes, backupCount=backups)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        self.logger.addHandler(handler)
+
+    #sqlite3 calls this for every statement it starts, including each trigger a statement fires, so the count shows work hidden behind one query
+    def count_step(self, statement):
+        self.steps.count = getattr(self.steps, "count", 0) + 1
+
+    def begin(self):
+        self.steps.count = 0
+        return time.perf_counter()
+
+    #Only the query text and the number of parameters are logged, never their values, which can include password hashes
+    def describe(self, query, params, seconds):
+        return f"{round(seconds*1000, 3)}ms {currentCommand.get()} {QUERY_NAMES.get(query, 'custom')} steps={getattr(self.steps, 'count', 0)} params={len(params)}: {' '.join(query.split())}"
+
+    def finish(self, connection, query, params, start):
+        seconds = time.perf_counter() - start
+        if seconds*1000 < self.threshold:
+            return
+        entry = self.describe(query, params, seconds)
+        plan = self.plan(connection, query, params)
+        if any(detail.startswith("SCAN ") and detail != "SCAN CONSTANT ROW" for detail in plan):
+            entry += "\n    " + "\n    ".join(plan)
+        self.logger.info(entry)
+
+    def fail(self, query, params, start, error):
+        self.logger.warning(f"{self.describe(query, params, time.perf_counter() - start)} failed with '{error}'")
+
+    #Plans only change with the schema or statistics, so each query is explained once
+    def plan(self, connection, query, params):
+        if query not in self.plans:
+            try:
+                connection = getattr(connection, "connection", connection)
+                self.plans[query] = [row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()]
+            except Error:
+                self.plans[query] = []
+        return self.plans[query]
+
+queryTracer = None if SLOW_QUERY_MS is None else QueryTracer(float(SLOW_QUERY_MS), SLOW_QUERY_LOG, SLOW_QUERY_LOG_BYTES, SLOW_QUERY_LOG_BACKUPS)
+
+#Applied to every connection. In WAL mode NORMAL only risks the last commits on power loss, never corruption, and readers never wait on the writer
+PRAGMAS = {
+    "synchronous": os.getenv("DB_SYNCHRONOUS", "NORMAL"),
+    "cache_size": os.getenv("DB_CACHE_SIZE", "-16384"),
+    "mmap_size": os.getenv("DB_MMAP_SIZE", "268435456"),
+    "busy_timeout": os.getenv("DB_BUSY_TIMEOUT", "5000"),
+}
+
+#Number of read-only connections serving lookups and reports alongside the writer
+DB_READERS = int(os.getenv("DB_READERS", "4"))
+
+def create_connection(path, readOnly=False):
     connection = None
     try:
-        connection = sqlite3.connect(path)
+        connection = sqlite3.connect(path, isolation_level=None, cached_statements=CACHED_STATEMENTS)
+        if not readOnly:
+            connection.execute("PRAGMA journal_mode = WAL")
+        for pragma, value in PRAGMAS.items():
+            connection.execute(f"PRAGMA {pragma} = {value}")
+        connection.execute("PRAGMA foreign_keys = ON")
+        if readOnly:
+            connection.execute("PRAGMA query_only = ON")
+        if queryTracer is not None:
+            connection.set_trace_callback(queryTracer.count_step)
         print("Connection to SQLite DB Successful")
     except Error as e:
         print(f"The error '{e}' occurred")
         
     return connection
 
-connection = create_connection(os.getenv('DB_PATH'))
+#All writes run on a single worker thread that owns the writer connection, so the event loop never blocks on disk I/O
+#Reads run on a pool of threads that each open their own read-only connection, so they never queue behind a write
+class Database:
+    def __init__(self, path, readers):
+        self.path = path
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="database")
+        self.connection = self.executor.submit(create_connection, path).result()
+        self.readers = threading.local()
+        self.readExecutor = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="database-reader", initializer=self.open_reader)
+
+    def open_reader(self):
+        self.readers.connection = create_connection(self.path, readOnly=True)
+
+    def run_reader(self, function, *args):
+        start = time.perf_counter()
+        try:
+            return function(self.readers.connection, *args)
+        finally:
+            metrics.record_database(time.perf_counter() - start)
+
+    def run_writer(self, function, *args):
+        start = time.perf_counter()
+        try:
+            return function(self.connection, *args)
+        finally:
+            accountCache.finish_write()
+            metrics.record_database(time.perf_counter() - start)
+
+    def run_blocking(self, function, *args):
+        return self.executor.submit(self.run_writer, function, *args).result()
+
+    #Executors don't carry context variables over to their threads, so the caller's context is copied in to keep the command it runs for
+    async def run(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(contextvars.copy_context().run, self.run_writer, function, *args))
+
+    async def read(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.readExecutor, partial(contextvars.copy_context().run, self.run_reader, function, *args))
+
+database = Database(os.getenv('DB_PATH'), DB_READERS)
 
 #endregion
 
-def execute_query(connection, query):
-    cursor = connection.cursor()
+def execute_statement(connection, query, params=()):
+    statementCache.record(query)
+    metrics.record_statement()
+    if queryTracer is None:
+        return connection.execute(query, params)
+
+    start = queryTracer.begin()
     try:
-        cursor.execute(query)
-        connection.commit()
-        print("Query executed successfully")
+        cursor = connection.execute(query, params)
     except Error as e:
-        print(f"The error '{e}' occurred")
-
-#region setup tables
-
-create_accounts_table = """
-CREATE TABLE IF NOT EXISTS accounts (
-  name TEXT NOT NULL,
-  password TEXT NOT NULL,
-  type TEXT NOT NULL,
-  money REAL NOT NULL,
-  interestRate REAL NOT NULL,
-  maxWithdraw INTEGER NOT NULL,
-  maxDeposit INTEGER NOT NULL,
-  maxTransfer INTEGER NOT NULL,
-  creditScore INTEGER NOT NULL,
-  amountWithdrew INTEGER NOT NULL,
-  amountDeposited INTEGER NOT NULL,
-  amountTransferred INTEGER NOT NULL
-);
-"""
-execute_query(connection, create_accounts_table)
-
-create_loans_table = """
-CREATE TABLE IF NOT EXISTS loans (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    accountName TEXT NOT NULL,
-    interestRate REAL NOT NULL,
-    originalAmount INTEGER NOT NULL,
-    amountRemaining REAL NOT NULL,
-    discordID INTEGER NOT NULL,
-    payPercent REAL NOT NULL,
-    lateFee INTEGER NOT NULL,
-    paid INTEGER NOT NULL
-);
-"""
-execute_query(connection, create_loans_table)
-
-create_lottery_table = """
-CREATE TABLE IF NOT EXISTS lottery (
-    accountName TEXT NOT NULL
-);
-"""
-execute_query(connection, create_lottery_table)
+        queryTracer.fail(query, params, start, e)
+        raise
+    queryTracer.finish(connection, query, params, start)
+    return cursor
+
+#SQLite finds rows as they are fetched, so reads are timed until the last row rather than the first
+def fetch_statement(connection, query, params=()):
+    statementCache.record(query)
+    metrics.record_statement()
+    if queryTracer is None:
+        return connection.execute(query, params).fetchall()
+
+    start = queryTracer.begin()
+    try:
+        rows = connection.execute(query, params).fetchall()
+    except Error as e:
+        queryTracer.fail(query, params, start, e)
+        raise
+    queryTracer.finish(connection, query, params, start)
+    return rows
 
-#endregion
+def execute_query(connection, query, params=()):
+    try:
+        execute_statement(connection, query, params)
+        return True
+    except Error as e:
+        print(f"The error '{e}' occurred")
+        return False
 
-def execute_read_query(connection, query):
-    cursor = connection.cursor()
-    result = None
+def execute_read_query(connection, query, params=()):
     try:
-        cursor.execute(query)
-        result = cursor.fetchall()
-        return result
+        return fetch_statement(connection, query, params)
     except Error as e:
         print(f"The error '{e}' occurred")
      
@@ -106,9 +495,6 @@ logID = os.getenv("LOG_CHANNEL_ID")
 suggestionID = os.getenv("SUGGESTION_CHANNEL_ID")
 complaintID = os.getenv("COMPLAINT_CHANNEL_ID")
 
-#Create pending queries list
-pendingQueries = [] 
-       
 #Account types
 accountTypes = ["Checking", "Savings", "Government", "Business"]
 
@@ -117,43 +503,1097 @@ ADMINS = os.getenv("ADMINS")
        
 #endregion
 
+#region Queries
+
+ACCOUNT_COLUMNS = "name, password, type, money, interestRate, maxWithdraw, maxDeposit, maxTransfer, creditScore, amountWithdrew, amountDeposited, amountTransferred"
+LOAN_COLUMNS = "id, accountName, interestRate, originalAmount, amountRemaining, discordID, payPercent, lateFee, paid"
+TRANSACTION_COLUMNS = "id, accountName, timestamp, type, amount, counterparty"
+
+#Every statement the bot runs, by name. Values are always bound as parameters so sqlite3 can reuse the compiled statement
+QUERIES = {
+    "begin": "BEGIN IMMEDIATE",
+    "commit": "COMMIT",
+    "rollback": "ROLLBACK",
+
+    "get_account": f"SELECT {ACCOUNT_COLUMNS} FROM accounts WHERE name = ?",
+    "create_account": "INSERT INTO accounts (name, password, type, money, interestRate, maxWithdraw, maxDeposit, maxTransfer, creditScore, amountWithdrew, amountDeposited, amountTransferred) VALUES (?, ?, ?, 0, ?, ?, ?, ?, 3, 0, 0, 0)",
+    "create_system_accounts": "INSERT INTO accounts (name, password, type, money, interestRate, maxWithdraw, maxDeposit, maxTransfer, creditScore, amountWithdrew, amountDeposited, amountTransferred) VALUES (?, ?, 'Official', 0, 0, 10137600, 10137600, 10137600, 3, 0, 0, 0), (?, ?, 'Official', 0, 0, 10137600, 10137600, 10137600, 3, 0, 0, 0) ON CONFLICT (name) DO NOTHING",
+    "delete_account": "DELETE FROM accounts WHERE name = ?",
+    "change_credit_score": "UPDATE accounts SET creditScore = creditScore + ?, maxWithdraw = maxWithdraw + ?, maxDeposit = maxDeposit + ?, maxTransfer = maxTransfer + ? WHERE name = ?",
+    "reset_daily_maximums": "UPDATE accounts SET amountDeposited = 0, amountWithdrew = 0, amountTransferred = 0",
+    "preview_account_interest": "SELECT count(*), coalesce(sum(CAST(round(money*interestRate) AS INTEGER)), 0) FROM accounts",
+    "apply_account_interest": "UPDATE accounts SET money = money + CAST(round(money*interestRate) AS INTEGER)",
+
+    "deposit": "UPDATE accounts SET money = money + ?, amountDeposited = amountDeposited + ? WHERE name = ?",
+    "deposit_within_limit": "UPDATE accounts SET money = money + ?, amountDeposited = amountDeposited + ? WHERE name = ? AND amountDeposited + ? <= maxDeposit",
+    "withdraw": "UPDATE accounts SET money = money - ?, amountWithdrew = amountWithdrew + ? WHERE name = ? AND money >= ?",
+    "withdraw_within_limit": "UPDATE accounts SET money = money - ?, amountWithdrew = amountWithdrew + ? WHERE name = ? AND money >= ? AND amountWithdrew + ? <= maxWithdraw",
+    "transfer_out": "UPDATE accounts SET money = money - ?, amountTransferred = amountTransferred + ? WHERE name = ? AND money >= ?",
+    "transfer_out_within_limit": "UPDATE accounts SET money = money - ?, amountTransferred = amountTransferred + ? WHERE name = ? AND money >= ? AND amountTransferred + ? <= maxTransfer",
+    "charge_account": "UPDATE accounts SET money = money - ? WHERE name = ? AND money >= ?",
+    "credit_account": "UPDATE accounts SET money = money + ? WHERE name = ?",
+
+    "get_loan": f"SELECT {LOAN_COLUMNS} FROM loans WHERE id = ?",
+    "get_loan_for_account": f"SELECT {LOAN_COLUMNS} FROM loans WHERE id = ? AND accountName = ?",
+    "get_loans_for_account": f"SELECT {LOAN_COLUMNS} FROM loans WHERE accountName = ?",
+    "create_loan": "INSERT INTO loans (accountName, interestRate, originalAmount, amountRemaining, discordID, payPercent, lateFee, paid) VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+    "pay_loan": "UPDATE loans SET amountRemaining = amountRemaining - ?, paid = 1 WHERE id = ? AND accountName = ? AND amountRemaining >= ?",
+    "delete_paid_loan": "DELETE FROM loans WHERE id = ? AND amountRemaining < ?",
+    "delete_loan": "DELETE FROM loans WHERE id = ?",
+    "preview_loan_interest": "SELECT count(*), coalesce(sum(paid = 0), 0), coalesce(sum(CAST(round(amountRemaining*interestRate) AS INTEGER)), 0), coalesce(sum(CASE WHEN paid = 0 THEN lateFee ELSE 0 END), 0) FROM loans",
+    "preview_loan_notices": "SELECT id, discordID, paid, lateFee, amountRemaining + CAST(round(amountRemaining*interestRate) AS INTEGER) + CASE WHEN paid = 0 THEN lateFee ELSE 0 END FROM loans",
+    "apply_loan_interest": "UPDATE loans SET amountRemaining = amountRemaining + CAST(round(amountRemaining*interestRate) AS INTEGER) + CASE WHEN paid = 0 THEN lateFee ELSE 0 END, paid = 0",
+
+    "count_lottery_tickets": "SELECT coalesce(sum(tickets), 0) FROM lottery WHERE draw = (SELECT id FROM lottery_draws WHERE winner IS NULL)",
+    "pick_lottery_winner": "SELECT accountName FROM (SELECT accountName, sum(tickets) OVER (ORDER BY accountName) AS cumulative FROM lottery WHERE draw = (SELECT id FROM lottery_draws WHERE winner IS NULL)) WHERE cumulative > ? ORDER BY cumulative LIMIT 1",
+    "add_lottery_tickets": "INSERT INTO lottery (draw, accountName, tickets) VALUES ((SELECT id FROM lottery_draws WHERE winner IS NULL), ?, ?) ON CONFLICT (draw, accountName) DO UPDATE SET tickets = tickets + excluded.tickets",
+    "pay_lottery_winner": "UPDATE accounts SET money = money + (SELECT money FROM accounts WHERE name = 'Lottery') WHERE name = ?",
+    "empty_lottery_account": "UPDATE accounts SET money = 0 WHERE name = 'Lottery'",
+    "close_lottery_draw": "UPDATE lottery_draws SET winner = ?, winnings = ?, drawnAt = CAST(strftime('%s', 'now') AS INTEGER) WHERE winner IS NULL",
+    "open_lottery_draw": "INSERT INTO lottery_draws DEFAULT VALUES",
+
+    "get_treasury": "SELECT type, accounts, money FROM treasury WHERE accounts > 0 ORDER BY type",
+    "get_leaderboard": "SELECT name, money FROM accounts WHERE type != 'Official' ORDER BY money DESC LIMIT ?",
+
+    "create_transaction": "INSERT INTO transactions (accountName, type, amount, counterparty) VALUES (?, ?, ?, ?)",
+    "record_account_interest": "INSERT INTO transactions (accountName, type, amount, counterparty) SELECT name, 'interest', CAST(round(money*interestRate) AS INTEGER), NULL FROM accounts WHERE CAST(round(money*interestRate) AS INTEGER) != 0",
+    "get_transactions": f"SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE accountName = ? ORDER BY timestamp DESC, id DESC LIMIT ?",
+    "get_transactions_before": f"SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE accountName = ? AND (timestamp, id) < (SELECT timestamp, id FROM transactions WHERE id = ?) ORDER BY timestamp DESC, id DESC LIMIT ?",
+
+    "get_approvals": "SELECT messageID, type, query, params, channelID, requestID, successMessage, denyMessage FROM approvals",
+    "create_approval": "INSERT INTO approvals (messageID, type, query, params, channelID, requestID, successMessage, denyMessage) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+    "delete_approval": "DELETE FROM approvals WHERE messageID = ?",
+    "create_job": "INSERT INTO jobs (name, lastRun) VALUES (?, ?) ON CONFLICT (name) DO NOTHING",
+    "claim_job": "UPDATE jobs SET lastRun = ? WHERE name = ? AND lastRun < ?",
+}
+
+QUERY_NAMES = {query: name for name, query in QUERIES.items()}
+
+#endregion
+
+#region Data Access
+
+#Money is stored and computed as whole cents (hundredths of an IMC Denar) so balances never drift; Money only parses and displays it
+#SQLite integers are 64-bit, so typed amounts are capped well below that to leave room for adding them to balances
+MAX_CENTS = 2**62
+MAX_DENARS = MAX_CENTS // 100
+
+class Money(int):
+    @classmethod
+    def parse(cls, text):
+        try:
+            amount = Decimal(text)
+        except InvalidOperation:
+            raise ValueError(text)
+        if not amount.is_finite() or abs(amount) > MAX_DENARS or amount != amount.quantize(Decimal("0.01")):
+            raise ValueError(text)
+        return cls(amount*100)
+
+    @classmethod
+    def denars(cls, amount):
+        return cls(amount*100)
+
+    #Rounded half away from zero to the nearest cent, the same as SQLite's round()
+    def share(self, rate):
+        return Money((Decimal(int(self))*Decimal(str(rate))).quantize(Decimal(1), ROUND_HALF_UP))
+
+    def __str__(self):
+        sign = "-" if self < 0 else ""
+        return f"{sign}{abs(self)//100}.{abs(self)%100:02d}"
+
+    def __format__(self, spec):
+        return format(str(self), spec)
+
+ACCOUNT_MONEY_FIELDS = ("money", "maxWithdraw", "maxDeposit", "maxTransfer", "amountWithdrew", "amountDeposited", "amountTransferred")
+LOAN_MONEY_FIELDS = ("originalAmount", "amountRemaining", "lateFee")
+
+class Account:
+    __slots__ = ("name", "password", "type", "money", "interestRate", "maxWithdraw", "maxDeposit", "maxTransfer", "creditScore", "amountWithdrew", "amountDeposited", "amountTransferred")
+
+    def __init__(self, name, password, type, money, interestRate, maxWithdraw, maxDeposit, maxTransfer, creditScore, amountWithdrew, amountDeposited, amountTransferred):
+        self.name = name
+        self.password = password
+        self.type = type
+        self.money = Money(money)
+        self.interestRate = interestRate
+        self.maxWithdraw = Money(maxWithdraw)
+        self.maxDeposit = Money(maxDeposit)
+        self.maxTransfer = Money(maxTransfer)
+        self.creditScore = creditScore
+        self.amountWithdrew = Money(amountWithdrew)
+        self.amountDeposited = Money(amountDeposited)
+        self.amountTransferred = Money(amountTransferred)
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        return cls(*row)
+
+class Loan:
+    __slots__ = ("id", "accountName", "interestRate", "originalAmount", "amountRemaining", "discordID", "payPercent", "lateFee", "paid")
+
+    def __init__(self, id, accountName, interestRate, originalAmount, amountRemaining, discordID, payPercent, lateFee, paid):
+        self.id = id
+        self.accountName = accountName
+        self.interestRate = interestRate
+        self.originalAmount = Money(originalAmount)
+        self.amountRemaining = Money(amountRemaining)
+        self.discordID = discordID
+        self.payPercent = payPercent
+        self.lateFee = Money(lateFee)
+        self.paid = paid
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        return cls(*row)
+
+class Transaction:
+    __slots__ = ("id", "accountName", "timestamp", "type", "amount", "counterparty")
+
+    def __init__(self, id, accountName, timestamp, type, amount, counterparty):
+        self.id = id
+        self.accountName = accountName
+        self.timestamp = timestamp
+        self.type = type
+        self.amount = Money(amount)
+        self.counterparty = counterparty
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        return cls(*row)
+
+def fetch_records(connection, recordType, query, params=()):
+    cursor = connection.cursor()
+    cursor.row_factory = recordType.from_row
+    try:
+        return fetch_statement(cursor, query, params)
+    except Error as e:
+        print(f"The error '{e}' occurred")
+        return []
+
+def get_account(connection, name):
+    account, version = accountCache.lookup(name)
+    if account is not None:
+        return account
+
+    accounts = fetch_records(connection, Account, QUERIES["get_account"], (name,))
+    if accounts == []:
+        return None
+    accountCache.store(name, accounts[0], version)
+    return accounts[0]
+
+def get_loan(connection, id, accountName=None):
+    if accountName is None:
+        loans = fetch_records(connection, Loan, QUERIES["get_loan"], (id,))
+    else:
+        loans = fetch_records(connection, Loan, QUERIES["get_loan_for_account"], (id, accountName))
+
+    if loans == []:
+        return None
+    return loans[0]
+
+def get_loans(connection, accountName):
+    return fetch_records(connection, Loan, QUERIES["get_loans_for_account"], (accountName,))
+
+HISTORY_PAGE_SIZE = 10
+LEADERBOARD_MAX = 25
+
+#Newest first; passing the id of the last transaction shown returns the page after it without scanning the rows before it
+def get_transactions(connection, accountName, limit, before=None):
+    if before is None:
+        return fetch_records(connection, Transaction, QUERIES["get_transactions"], (accountName, limit))
+    return fetch_records(connection, Transaction, QUERIES["get_transactions_before"], (accountName, before, limit))
+
+def loan_summary(loans):
+    loanString = ""
+    for loan in loans:
+        payAmount = loan.amountRemaining.share(loan.payPercent)
+
+        if loan.paid == 1:
+            paidString = "have"
+        else:
+            paidString = "have not"
+
+        loanString += "ID: " + str(loan.id) + ";  Amount Remaining: " + str(loan.amountRemaining) + " IMC Denars; You must pay " + str(payAmount) + " IMC Denars before the end of the next two week period and you **" + paidString + "** paid it" + "\n\n"
+
+    return loanString
+
+#endregion
+
 #region Util Functions
 
+#Runs everything inside the block as one BEGIN IMMEDIATE ... COMMIT, rolling back if anything raises, including the commit itself
+#SQLite may already have rolled back after some errors, so the rollback is only issued while the transaction is still open
+@contextmanager
+def transaction(connection):
+    execute_statement(connection, QUERIES["begin"])
+    try:
+        yield connection
+        execute_statement(connection, QUERIES["commit"])
+    except BaseException:
+        if connection.in_transaction:
+            execute_statement(connection, QUERIES["rollback"])
+        raise
+
 def execute_query_many(connection, queries):
-    cursor = connection.cursor()
-    for query in queries:
+    try:
+        with transaction(connection):
+            for query, params in queries:
+                execute_statement(connection, query, params)
+        return True
+    except Error as e:
+        print(f"The error '{e}' occurred")
+        return False
+
+#Channels and users are resolved once and then served from memory until they expire or are invalidated by a gateway event
+RESOURCE_TTL = float(os.getenv("RESOURCE_TTL", "3600"))
+
+class ResourceCache:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.entries = {}
+
+    async def get(self, key, lookup, fetch):
+        entry = self.entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+
+        resource = lookup(key[1]) or await fetch(key[1])
+        self.entries[key] = (resource, time.monotonic() + self.ttl)
+        return resource
+
+    def invalidate(self, key):
+        self.entries.pop(key, None)
+
+resourceCache = ResourceCache(RESOURCE_TTL)
+
+async def get_channel(id):
+    return await resourceCache.get(("channel", int(id)), bot.get_channel, bot.fetch_channel)
+
+async def get_user(id):
+    return await resourceCache.get(("user", int(id)), bot.get_user, bot.fetch_user)
+
+#Passwords are stored as salted scrypt hashes. hashlib releases the GIL while hashing, so checks run on their own threads and never block the gateway
+#The work factor only applies to new hashes; each stored hash records the parameters it was made with
+SCRYPT_N = int(os.getenv("SCRYPT_N", str(2**14)))
+SCRYPT_R, SCRYPT_P = 8, 1
+CREDENTIAL_WORKERS = int(os.getenv("CREDENTIAL_WORKERS", "2"))
+credentialPool = ThreadPoolExecutor(max_workers=CREDENTIAL_WORKERS, thread_name_prefix="credentials")
+
+def hash_password(password, salt=None, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    if salt is None:
+        salt = os.urandom(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, dklen=32)
+    return f"scrypt${n}${r}${p}${salt.hex()}${digest.hex()}"
+
+def check_password(password, stored):
+    try:
+        _, n, r, p, salt, _ = stored.split("$")
+        candidate = hash_password(password, bytes.fromhex(salt), int(n), int(r), int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(candidate, stored)
+
+async def run_credentials(function, *args):
+    return await asyncio.get_running_loop().run_in_executor(credentialPool, function, *args)
+
+#Successful checks are remembered briefly so repeat commands skip the hash. Entries are keyed by a keyed digest of the name, password and stored hash,
+#so no password is kept in memory and a password change misses the cache
+VERIFIED_TTL = float(os.getenv("VERIFIED_TTL", "300"))
+VERIFIED_SIZE = int(os.getenv("VERIFIED_SIZE", "256"))
+
+class VerifiedLogins:
+    def __init__(self, ttl, size):
+        self.ttl = ttl
+        self.size = size
+        self.key = os.urandom(32)
+        self.entries = OrderedDict()
+
+    def fingerprint(self, account, password):
+        return hmac.digest(self.key, f"{account.name}\0{password}\0{account.password}".encode(), "sha256")
+
+    def check(self, fingerprint):
+        expires = self.entries.get(fingerprint)
+        if expires is None:
+            return False
+        if expires <= time.monotonic():
+            del self.entries[fingerprint]
+            return False
+        return True
+
+    def add(self, fingerprint):
+        self.entries[fingerprint] = time.monotonic() + self.ttl
+        self.entries.move_to_end(fingerprint)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+verifiedLogins = VerifiedLogins(VERIFIED_TTL, VERIFIED_SIZE)
+
+#Returns the account if the password matches, otherwise None
+async def authenticate(name, password):
+    account = await database.read(get_account, name)
+    if account is None or password is None:
+        return None
+
+    fingerprint = verifiedLogins.fingerprint(account, password)
+    if verifiedLogins.check(fingerprint):
+        return account
+    if not await run_credentials(check_password, password, account.password):
+        return None
+
+    verifiedLogins.add(fingerprint)
+    return account
+
+#Logged in users are remembered by discord ID so they don't have to type their name and password into every command
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+
+class SessionStore:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.sessions = {}
+
+    #The password hash from login is kept so a session ends as soon as the password is changed
+    def start(self, discordID, account):
+        self.evict()
+        self.sessions[discordID] = (account.name, account.password, time.monotonic() + self.ttl)
+
+    def get(self, discordID):
+        session = self.sessions.get(discordID)
+        if session is None:
+            return None
+        if session[2] <= time.monotonic():
+            del self.sessions[discordID]
+            return None
+        return session[:2]
+
+    def end(self, discordID):
+        return self.sessions.pop(discordID, None) is not None
+
+    def evict(self):
+        now = time.monotonic()
+        for discordID in [discordID for discordID, session in self.sessions.items() if session[2] <= now]:
+            del self.sessions[discordID]
+
+sessions = SessionStore(SESSION_TTL)
+
+#Commands take "name password ..." but a logged in user only types the rest, which then arrives shifted into name and password
+#Returns the authenticated account followed by the remaining arguments, or replies and returns None
+async def resolve_login(message, arguments, optional=0):
+    typed = len(arguments)
+    while typed > 0 and arguments[typed-1] is None:
+        typed -= 1
+
+    if typed >= len(arguments) - optional:
+        account = await authenticate(arguments[0], arguments[1])
+        arguments = arguments[2:]
+    else:
+        session = sessions.get(message.author.id)
+        if session is None or typed < len(arguments) - optional - 2:
+            await message.reply(f"All arguments not provided, try running the help command or logging in with {prefix}login")
+            return None
+        #More was typed than the command takes without a name and password, so part of it would be silently dropped
+        name, password = session
+        if typed > len(arguments) - 2:
+            await message.reply(f"You are logged in as {name}, so leave out the name and password or run {prefix}logout to use another account")
+            return None
+        account = await database.read(get_account, name)
+        arguments = arguments[:-2]
+        if account is None or account.password != password:
+            sessions.end(message.author.id)
+            await message.reply(f"Your login has ended because the account was changed, log in again with {prefix}login")
+            return None
+
+    if account is None:
+        await message.reply("Incorrect name or password. If you believe that you have the correct name and password, contact bank staff.")
+        return None
+    return [account, *arguments]
+
+#Discord rate limits DMs per bot, so only this many are in flight at once
+DM_CONCURRENCY = int(os.getenv("DM_CONCURRENCY", "5"))
+
+async def send_dm(semaphore, discordID, content):
+    async with semaphore:
         try:
-            cursor.execute(query)
-            connection.commit()
-            print("Query of many executed successfully")
-        except Error as e:
+            discordUser = await get_user(discordID)
+            await discordUser.send(content)
+            return True
+        except discord.HTTPException as e:
             print(f"The error '{e}' occurred")
+            return False
+
+#Sends every {discordID: content} digest concurrently and returns how many were delivered and how many failed
+async def send_digests(digests):
+    semaphore = asyncio.Semaphore(DM_CONCURRENCY)
+    results = await asyncio.gather(*(send_dm(semaphore, discordID, content) for discordID, content in digests.items()))
+    delivered = sum(results)
+    return delivered, len(results) - delivered
+
+#Routine log entries are queued and posted together so user replies never wait on the log channel; approval prompts are still sent directly
+AUDIT_FLUSH_SIZE = int(os.getenv("AUDIT_FLUSH_SIZE", "20"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "5"))
+MESSAGE_LIMIT = 2000
+
+class AuditLogger:
+    def __init__(self, channelID, flushSize, flushInterval):
+        self.channelID = channelID
+        self.flushSize = flushSize
+        self.flushInterval = flushInterval
+        self.queue = asyncio.Queue()
+        self.batch = []
+        self.task = None
+        self.sending = None
+
+    def log(self, entry):
+        self.queue.put_nowait(entry[:MESSAGE_LIMIT])
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self.batch.append(await self.queue.get())
+            deadline = loop.time() + self.flushInterval
+            while len(self.batch) < self.flushSize:
+                try:
+                    async with asyncio.timeout_at(deadline):
+                        self.batch.append(await self.queue.get())
+                except TimeoutError:
+                    break
+            entries, self.batch = self.batch, []
+            #Shielded so that stopping the logger mid-send lets the batch finish sending instead of dropping it
+            self.sending = asyncio.create_task(self.flush(entries))
+            await asyncio.shield(self.sending)
+
+    #Stops the background flush, waits for any batch it was sending and posts whatever is still waiting, used before shutting down
+    async def drain(self):
+        if self.task is not None:
+            self.task.cancel()
+        if self.sending is not None:
+            await self.sending
+        entries, self.batch = self.batch, []
+        while not self.queue.empty():
+            entries.append(self.queue.get_nowait())
+        if entries:
+            await self.flush(entries)
+
+    async def flush(self, entries):
+        messages = [entries[0]]
+        for entry in entries[1:]:
+            if len(messages[-1]) + len(entry) + 1 > MESSAGE_LIMIT:
+                messages.append(entry)
+            else:
+                messages[-1] += "\n" + entry
 
-MINUTES_IN_DAY = 60*24
-
-async def start_daily_cycle():
-    minutes=0
-    while True:
-        print(str(minutes))
-        if minutes >= MINUTES_IN_DAY: await updateMaximums(); minutes = 0;
-        await asyncio.sleep(60)
-        minutes += 1
+        try:
+            channel = await get_channel(self.channelID)
+            for content in messages:
+                await channel.send(content)
+        except discord.HTTPException as e:
+            print(f"The error '{e}' occurred")
 
+auditLog = AuditLogger(logID, AUDIT_FLUSH_SIZE, AUDIT_FLUSH_INTERVAL)
+
+#Jobs fire on wall-clock boundaries counted from the Unix epoch (midnight UTC for daily jobs) and record each run in the jobs table,
+#so a restart neither repeats nor forgets a run and a reconnect cannot start a second copy of a job
+SECONDS_IN_DAY = 60*60*24
+JOB_RETRY_DELAY = 60
+
+def claim_job(connection, name, now, interval):
+    boundary = now - now % interval
+    with transaction(connection):
+        #A new job counts as having just run, so it first fires on the next boundary rather than at startup
+        execute_statement(connection, QUERIES["create_job"], (name, now))
+        claimed = execute_statement(connection, QUERIES["claim_job"], (now, name, boundary)).rowcount == 1
+    return claimed, boundary + interval
+
+class Scheduler:
+    def __init__(self):
+        self.jobs = {}
+        self.tasks = {}
+
+    def register(self, name, interval, function):
+        self.jobs[name] = (interval, function)
+
+    def start(self):
+        for name in self.jobs:
+            if name not in self.tasks or self.tasks[name].done():
+                self.tasks[name] = asyncio.create_task(self.run_job(name))
+
+    #A failed claim, such as a busy database, is retried after a short wait rather than ending the job's task
+    async def run_job(self, name):
+        interval, function = self.jobs[name]
+        while True:
+            try:
+                claimed, nextRun = await database.run(claim_job, name, time.time(), interval)
+            except Error as e:
+                print(f"The error '{e}' occurred")
+                await asyncio.sleep(JOB_RETRY_DELAY)
+                continue
+
+            if claimed:
+                print(f"Running scheduled job {name}")
+                try:
+                    await function()
+                except Exception as e:
+                    print(f"The error '{e}' occurred")
+            await asyncio.sleep(max(nextRun - time.time(), 0))
+
+scheduler = Scheduler()
+
+#The reset runs before anything touches Discord, so a failed log message can't cost a day of limits
 async def updateMaximums():
-    channel = await bot.fetch_channel(logID)
-    logMessage = await channel.send('Updating account maximums')
+    if await database.run(execute_query, QUERIES["reset_daily_maximums"]):
+        auditLog.log('Updated account maximums')
+    else:
+        auditLog.log('Account maximums could not be updated')
     
-    reset_query = """
-    UPDATE accounts
-    SET amountDeposited = 0,
-        amountWithdrew = 0,
-        amountTransferred = 0"""
-        
-    execute_query(connection, reset_query)
+#endregion 
+
+#region Migrations
+
+#Hashes plaintext passwords left by earlier versions, including those held in pending approvals, which also lose the password their queries no longer check
+#Interest queries as they were saved before migration 8, when money was REAL denars rounded to two places
+DENAR_INTEREST_QUERIES = {
+    "UPDATE accounts SET money = round(money*(1+interestRate), 2)": "apply_account_interest",
+    "INSERT INTO transactions (accountName, type, amount, counterparty) SELECT name, 'interest', round(money*interestRate, 2), NULL FROM accounts WHERE round(money*interestRate, 2) != 0": "record_account_interest",
+    "UPDATE loans SET amountRemaining = round(amountRemaining*(1+interestRate) + CASE WHEN paid = 0 THEN lateFee ELSE 0 END, 2), paid = 0": "apply_loan_interest",
+}
+
+def denars_to_cents(value):
+    return int((Decimal(str(value))*100).quantize(Decimal(1), ROUND_HALF_UP))
+
+#Pending approvals hold amounts in denars, so they are converted along with the tables or approving one would apply a hundredth of it
+def scale_approval_amounts(connection):
+    for messageID, type, query, params in connection.execute("SELECT messageID, type, query, params FROM approvals").fetchall():
+        query, params = json.loads(query), json.loads(params)
+        if type == "operation":
+            positions = {"deposit": (2,), "withdraw": (2,), "transfer": (3,), "grant_loan": (2, 5)}.get(query, ())
+        elif type == "many":
+            query = [[QUERIES[DENAR_INTEREST_QUERIES[statement]] if statement in DENAR_INTEREST_QUERIES else statement, statementParams] for statement, statementParams in query]
+            positions = ()
+        elif query in DENAR_INTEREST_QUERIES:
+            query, positions = QUERIES[DENAR_INTEREST_QUERIES[query]], ()
+        elif query == QUERIES["create_account"]:
+            positions = (4, 5, 6)
+        elif query == QUERIES["change_credit_score"]:
+            positions = (1, 2, 3)
+        elif any(query == f"UPDATE accounts SET {field} = ? WHERE name = ?" for field in ACCOUNT_MONEY_FIELDS) or any(query == f"UPDATE loans SET {field} = ? WHERE id = ?" for field in LOAN_MONEY_FIELDS):
+            positions = (0,)
+        else:
+            continue
+
+        for position in positions:
+            try:
+                params[position] = denars_to_cents(params[position])
+            except InvalidOperation:
+                pass
+        connection.execute("UPDATE approvals SET query = ?, params = ? WHERE messageID = ?", (json.dumps(query), json.dumps(params), messageID))
+
+def hash_stored_passwords(connection):
+    accounts = connection.execute("SELECT name, password FROM accounts WHERE password NOT LIKE 'scrypt$%'").fetchall()
+    hashes = credentialPool.map(hash_password, [password for _, password in accounts])
+    connection.executemany("UPDATE accounts SET password = ? WHERE name = ?", [(hashed, name) for (name, _), hashed in zip(accounts, hashes)])
+
+    for messageID, type, query, params in connection.execute("SELECT messageID, type, query, params FROM approvals").fetchall():
+        query, params = json.loads(query), json.loads(params)
+        if type == "operation" and query in ("deposit", "withdraw", "transfer"):
+            del params[1]
+        elif query == QUERIES["create_account"]:
+            params[1] = hash_password(params[1])
+        elif query == "UPDATE accounts SET password = ? WHERE name = ?":
+            params[0] = hash_password(params[0])
+        elif query == "DELETE FROM accounts WHERE name = ? AND password = ?":
+            query, params = QUERIES["delete_account"], params[:1]
+        else:
+            continue
+        connection.execute("UPDATE approvals SET query = ?, params = ? WHERE messageID = ?", (json.dumps(query), json.dumps(params), messageID))
+
+#Filled in with the winner and winnings drawn when the approval is given
+LOTTERY_WINNER_MESSAGE = "The winner is the account with name {winner} and they won {winnings} IMC Denars"
+
+#Lottery approvals used to carry a winner picked when they were requested; now the winner is drawn on approval, so the stale pick and its message are dropped
+def redraw_pending_lotteries(connection):
+    connection.execute("UPDATE approvals SET params = '[]', successMessage = ? WHERE type = 'operation' AND query = ?", (LOTTERY_WINNER_MESSAGE, json.dumps("pay_lottery_winner")))
+
+#Each migration is a list of statements, or functions taking the connection; PRAGMA user_version records how many have been applied
+MIGRATIONS = [
+    #1: original schema
+    [
+        """
+        CREATE TABLE IF NOT EXISTS accounts (
+          name TEXT NOT NULL,
+          password TEXT NOT NULL,
+          type TEXT NOT NULL,
+          money REAL NOT NULL,
+          interestRate REAL NOT NULL,
+          maxWithdraw INTEGER NOT NULL,
+          maxDeposit INTEGER NOT NULL,
+          maxTransfer INTEGER NOT NULL,
+          creditScore INTEGER NOT NULL,
+          amountWithdrew INTEGER NOT NULL,
+          amountDeposited INTEGER NOT NULL,
+          amountTransferred INTEGER NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS loans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            accountName TEXT NOT NULL,
+            interestRate REAL NOT NULL,
+            originalAmount INTEGER NOT NULL,
+            amountRemaining REAL NOT NULL,
+            discordID INTEGER NOT NULL,
+            payPercent REAL NOT NULL,
+            lateFee INTEGER NOT NULL,
+            paid INTEGER NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS lottery (
+            accountName TEXT NOT NULL
+        )
+        """,
+    ],
+    #2: unique account names, indexed loan/ticket lookups and cascading foreign keys
+    [
+        #Older databases could hold duplicate names, keep the first and rename the rest so the unique index can be built
+        "UPDATE accounts SET name = name || '#' || rowid WHERE rowid NOT IN (SELECT min(rowid) FROM accounts GROUP BY name)",
+        "CREATE UNIQUE INDEX accounts_name ON accounts (name)",
+        "DELETE FROM loans WHERE accountName NOT IN (SELECT name FROM accounts)",
+        "DELETE FROM lottery WHERE accountName NOT IN (SELECT name FROM accounts)",
+        """
+        CREATE TABLE loans_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            accountName TEXT NOT NULL REFERENCES accounts (name) ON UPDATE CASCADE ON DELETE CASCADE,
+            interestRate REAL NOT NULL,
+            originalAmount INTEGER NOT NULL,
+            amountRemaining REAL NOT NULL,
+            discordID INTEGER NOT NULL,
+            payPercent REAL NOT NULL,
+            lateFee INTEGER NOT NULL,
+            paid INTEGER NOT NULL
+        )
+        """,
+        "INSERT INTO loans_new SELECT id, accountName, interestRate, originalAmount, amountRemaining, discordID, payPercent, lateFee, paid FROM loans",
+        "DROP TABLE loans",
+        "ALTER TABLE loans_new RENAME TO loans",
+        "CREATE INDEX loans_accountName ON loans (accountName)",
+        """
+        CREATE TABLE lottery_new (
+            accountName TEXT NOT NULL REFERENCES accounts (name) ON UPDATE CASCADE ON DELETE CASCADE
+        )
+        """,
+        "INSERT INTO lottery_new SELECT accountName FROM lottery",
+        "DROP TABLE lottery",
+        "ALTER TABLE lottery_new RENAME TO lottery",
+        "CREATE INDEX lottery_accountName ON lottery (accountName)",
+    ],
+    #3: pending approvals, keyed by the log message staff react to
+    [
+        """
+        CREATE TABLE approvals (
+            messageID INTEGER PRIMARY KEY,
+            type TEXT NOT NULL,
+            query TEXT NOT NULL,
+            params TEXT NOT NULL,
+            channelID INTEGER NOT NULL,
+            requestID INTEGER NOT NULL,
+            successMessage TEXT NOT NULL,
+            denyMessage TEXT NOT NULL
+        )
+        """,
+    ],
+    #4: last run time of each scheduled job
+    [
+        """
+        CREATE TABLE jobs (
+            name TEXT PRIMARY KEY,
+            lastRun REAL NOT NULL
+        )
+        """,
+    ],
+    #5: append-only ledger of every balance change, kept after an account is deleted
+    [
+        """
+        CREATE TABLE transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            accountName TEXT NOT NULL,
+            timestamp INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+            type TEXT NOT NULL,
+            amount REAL NOT NULL,
+            counterparty TEXT
+        )
+        """,
+        "CREATE INDEX transactions_accountName_timestamp ON transactions (accountName, timestamp, id)",
+        "CREATE TRIGGER transactions_no_update BEFORE UPDATE ON transactions BEGIN SELECT RAISE(ABORT, 'transactions are append-only'); END",
+        "CREATE TRIGGER transactions_no_delete BEFORE DELETE ON transactions BEGIN SELECT RAISE(ABORT, 'transactions are append-only'); END",
+    ],
+    #6: running totals per account type, kept current by triggers on every change to an account's money or type, and an index for the leaderboard
+    [
+        """
+        CREATE TABLE treasury (
+            type TEXT PRIMARY KEY,
+            accounts INTEGER NOT NULL,
+            money REAL NOT NULL
+        )
+        """,
+        "INSERT INTO treasury (type, accounts, money) SELECT type, count(*), round(sum(money), 2) FROM accounts GROUP BY type",
+        """
+        CREATE TRIGGER treasury_insert AFTER INSERT ON accounts BEGIN
+            INSERT INTO treasury (type, accounts, money) VALUES (new.type, 1, new.money)
+                ON CONFLICT (type) DO UPDATE SET accounts = accounts + 1, money = round(money + excluded.money, 2);
+        END
+        """,
+        """
+        CREATE TRIGGER treasury_delete AFTER DELETE ON accounts BEGIN
+            UPDATE treasury SET accounts = accounts - 1, money = round(money - old.money, 2) WHERE type = old.type;
+        END
+        """,
+        """
+        CREATE TRIGGER treasury_update AFTER UPDATE OF money, type ON accounts BEGIN
+            UPDATE treasury SET accounts = accounts - 1, money = round(money - old.money, 2) WHERE type = old.type;
+            INSERT INTO treasury (type, accounts, money) VALUES (new.type, 1, new.money)
+                ON CONFLICT (type) DO UPDATE SET accounts = accounts + 1, money = round(money + excluded.money, 2);
+        END
+        """,
+        "CREATE INDEX accounts_money ON accounts (money)",
+    ],
+    #7: one row per account per draw holding its ticket count, instead of one row per ticket
+    [
+        """
+        CREATE TABLE lottery_draws (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            winner TEXT,
+            winnings REAL,
+            drawnAt INTEGER
+        )
+        """,
+        "INSERT INTO lottery_draws (id) VALUES (1)",
+        """
+        CREATE TABLE lottery_new (
+            draw INTEGER NOT NULL REFERENCES lottery_draws (id),
+            accountName TEXT NOT NULL REFERENCES accounts (name) ON UPDATE CASCADE ON DELETE CASCADE,
+            tickets INTEGER NOT NULL,
+            PRIMARY KEY (draw, accountName)
+        )
+        """,
+        "INSERT INTO lottery_new (draw, accountName, tickets) SELECT 1, accountName, count(*) FROM lottery GROUP BY accountName",
+        "DROP TABLE lottery",
+        "ALTER TABLE lottery_new RENAME TO lottery",
+        "CREATE INDEX lottery_accountName ON lottery (accountName)",
+    ],
+    #8: money columns hold integer cents instead of REAL denars
+    [
+        """
+        CREATE TABLE accounts_new (
+          name TEXT NOT NULL,
+          password TEXT NOT NULL,
+          type TEXT NOT NULL,
+          money INTEGER NOT NULL,
+          interestRate REAL NOT NULL,
+          maxWithdraw INTEGER NOT NULL,
+          maxDeposit INTEGER NOT NULL,
+          maxTransfer INTEGER NOT NULL,
+          creditScore INTEGER NOT NULL,
+          amountWithdrew INTEGER NOT NULL,
+          amountDeposited INTEGER NOT NULL,
+          amountTransferred INTEGER NOT NULL
+        )
+        """,
+        """
+        INSERT INTO accounts_new SELECT name, password, type, CAST(round(money*100) AS INTEGER), interestRate,
+            CAST(round(maxWithdraw*100) AS INTEGER), CAST(round(maxDeposit*100) AS INTEGER), CAST(round(maxTransfer*100) AS INTEGER), creditScore,
+            CAST(round(amountWithdrew*100) AS INTEGER), CAST(round(amountDeposited*100) AS INTEGER), CAST(round(amountTransferred*100) AS INTEGER)
+        FROM accounts
+        """,
+        "DROP TABLE accounts",
+        "ALTER TABLE accounts_new RENAME TO accounts",
+        "CREATE UNIQUE INDEX accounts_name ON accounts (name)",
+        "CREATE INDEX accounts_money ON accounts (money)",
+        """
+        CREATE TABLE loans_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            accountName TEXT NOT NULL REFERENCES accounts (name) ON UPDATE CASCADE ON DELETE CASCADE,
+            interestRate REAL NOT NULL,
+            originalAmount INTEGER NOT NULL,
+            amountRemaining INTEGER NOT NULL,
+            discordID INTEGER NOT NULL,
+            payPercent REAL NOT NULL,
+            lateFee INTEGER NOT NULL,
+            paid INTEGER NOT NULL
+        )
+        """,
+        "INSERT INTO loans_new SELECT id, accountName, interestRate, CAST(round(originalAmount*100) AS INTEGER), CAST(round(amountRemaining*100) AS INTEGER), discordID, payPercent, CAST(round(lateFee*100) AS INTEGER), paid FROM loans",
+        "DROP TABLE loans",
+        "ALTER TABLE loans_new RENAME TO loans",
+        "CREATE INDEX loans_accountName ON loans (accountName)",
+        """
+        CREATE TABLE transactions_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            accountName TEXT NOT NULL,
+            timestamp INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+            type TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            counterparty TEXT
+        )
+        """,
+        "INSERT INTO transactions_new SELECT id, accountName, timestamp, type, CAST(round(amount*100) AS INTEGER), counterparty FROM transactions",
+        "DROP TABLE transactions",
+        "ALTER TABLE transactions_new RENAME TO transactions",
+        "CREATE INDEX transactions_accountName_timestamp ON transactions (accountName, timestamp, id)",
+        "CREATE TRIGGER transactions_no_update BEFORE UPDATE ON transactions BEGIN SELECT RAISE(ABORT, 'transactions are append-only'); END",
+        "CREATE TRIGGER transactions_no_delete BEFORE DELETE ON transactions BEGIN SELECT RAISE(ABORT, 'transactions are append-only'); END",
+        """
+        CREATE TABLE lottery_draws_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            winner TEXT,
+            winnings INTEGER,
+            drawnAt INTEGER
+        )
+        """,
+        "INSERT INTO lottery_draws_new SELECT id, winner, CAST(round(winnings*100) AS INTEGER), drawnAt FROM lottery_draws",
+        "DROP TABLE lottery_draws",
+        "ALTER TABLE lottery_draws_new RENAME TO lottery_draws",
+        "DROP TABLE treasury",
+        """
+        CREATE TABLE treasury (
+            type TEXT PRIMARY KEY,
+            accounts INTEGER NOT NULL,
+            money INTEGER NOT NULL
+        )
+        """,
+        "INSERT INTO treasury (type, accounts, money) SELECT type, count(*), sum(money) FROM accounts GROUP BY type",
+        """
+        CREATE TRIGGER treasury_insert AFTER INSERT ON accounts BEGIN
+            INSERT INTO treasury (type, accounts, money) VALUES (new.type, 1, new.money)
+                ON CONFLICT (type) DO UPDATE SET accounts = accounts + 1, money = money + excluded.money;
+        END
+        """,
+        """
+        CREATE TRIGGER treasury_delete AFTER DELETE ON accounts BEGIN
+            UPDATE treasury SET accounts = accounts - 1, money = money - old.money WHERE type = old.type;
+        END
+        """,
+        """
+        CREATE TRIGGER treasury_update AFTER UPDATE OF money, type ON accounts BEGIN
+            UPDATE treasury SET accounts = accounts - 1, money = money - old.money WHERE type = old.type;
+            INSERT INTO treasury (type, accounts, money) VALUES (new.type, 1, new.money)
+                ON CONFLICT (type) DO UPDATE SET accounts = accounts + 1, money = money + excluded.money;
+        END
+        """,
+        scale_approval_amounts,
+    ],
+    #9: salted password hashes
+    [
+        hash_stored_passwords,
+    ],
+    #10: the open draw is looked up on every ticket purchase, so index it rather than scan every past draw
+    [
+        "CREATE UNIQUE INDEX lottery_draws_open ON lottery_draws (id) WHERE winner IS NULL",
+    ],
+    #11: lottery winners are drawn when the approval is given
+    [
+        redraw_pending_lotteries,
+    ],
+]
+
+#Foreign keys are off while migrating, as SQLite requires for rebuilding a parent table, and are checked before each migration commits
+def migrate(connection):
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    connection.execute("PRAGMA foreign_keys = OFF")
+    try:
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            with transaction(connection):
+                for statement in migration:
+                    if callable(statement):
+                        statement(connection)
+                    else:
+                        connection.execute(statement)
+                if connection.execute("PRAGMA foreign_key_check").fetchall() != []:
+                    raise Error(f"Migration {number} broke a foreign key")
+                connection.execute(f"PRAGMA user_version = {number}")
+            print(f"Migrated database to version {number}")
+    finally:
+        connection.execute("PRAGMA foreign_keys = ON")
+
+database.run_blocking(migrate)
+database.run_blocking(watch_accounts)
+#Loans and the lottery pay into IMC and Lottery, so they must exist even without a password configured; such an account just can't be logged in to
+#Unlike execute_query this raises, so a database that can't hold them stops the bot at startup instead of failing every payment later
+UNUSABLE_PASSWORD = "!"
+
+def system_password(password):
+    return hash_password(password) if password else UNUSABLE_PASSWORD
+
+database.run_blocking(execute_statement, QUERIES["create_system_accounts"], ('IMC', system_password(os.getenv("IMC_PASSWORD")), 'Lottery', system_password(os.getenv("LOTTERY_PASSWORD"))))
+
+#endregion
+
+#region Bank Operations
+
+LOAN_FEE = Money.denars(4)
+TICKET_COST = Money.denars(8)
+PERCENT_PROFIT = 0.1
+MAX_TICKETS = MAX_CENTS // TICKET_COST
+
+#Raised inside an operation when a guarded update matched no rows, which rolls the whole operation back
+class OperationRejected(Exception):
+    pass
+
+def guarded_update(connection, query, params):
+    if execute_statement(connection, query, params).rowcount == 0:
+        raise OperationRejected(query)
+
+def record_transaction(connection, accountName, type, amount, counterparty=None):
+    execute_statement(connection, QUERIES["create_transaction"], (accountName, type, amount, counterparty))
+
+#Operations that work out something the reply needs, like a lottery winner, return it as a dict for the success message
+def execute_operation(connection, operation, *args):
+    try:
+        with transaction(connection):
+            result = operation(connection, *args)
+        return True if result is None else result
+    except OperationRejected:
+        return False
+    except Error as e:
+        print(f"The error '{e}' occurred")
+        return False
+
+def deposit(connection, name, amount, withinLimit):
+    if withinLimit:
+        guarded_update(connection, QUERIES["deposit_within_limit"], (amount, amount, name, amount))
+    else:
+        guarded_update(connection, QUERIES["deposit"], (amount, amount, name))
+    record_transaction(connection, name, "deposit", amount)
+
+def withdraw(connection, name, amount, withinLimit):
+    if withinLimit:
+        guarded_update(connection, QUERIES["withdraw_within_limit"], (amount, amount, name, amount, amount))
+    else:
+        guarded_update(connection, QUERIES["withdraw"], (amount, amount, name, amount))
+    record_transaction(connection, name, "withdraw", -amount)
+
+def transfer(connection, name, recipientName, amount, withinLimit):
+    if withinLimit:
+        guarded_update(connection, QUERIES["transfer_out_within_limit"], (amount, amount, name, amount, amount))
+    else:
+        guarded_update(connection, QUERIES["transfer_out"], (amount, amount, name, amount))
+    guarded_update(connection, QUERIES["credit_account"], (amount, recipientName))
+    record_transaction(connection, name, "transfer", -amount, recipientName)
+    record_transaction(connection, recipientName, "transfer", amount, name)
+
+def pay_loan(connection, name, id, amount):
+    guarded_update(connection, QUERIES["charge_account"], (amount, name, amount))
+    guarded_update(connection, QUERIES["credit_account"], (amount, 'IMC'))
+    guarded_update(connection, QUERIES["pay_loan"], (amount, id, name, amount))
+    execute_statement(connection, QUERIES["delete_paid_loan"], (id, Money.denars(1)))
+    record_transaction(connection, name, "loan payment", -amount, 'IMC')
+    record_transaction(connection, 'IMC', "loan payment", amount, name)
+
+def grant_loan(connection, name, interestRate, amount, discordID, payPercent, lateFee):
+    guarded_update(connection, QUERIES["credit_account"], (amount, name))
+    guarded_update(connection, QUERIES["credit_account"], (-amount, 'IMC'))
+    execute_statement(connection, QUERIES["create_loan"], (name, interestRate, amount, amount+LOAN_FEE, discordID, payPercent, lateFee))
+    record_transaction(connection, name, "loan", amount, 'IMC')
+    record_transaction(connection, 'IMC', "loan", -amount, name)
+
+def buy_lottery_ticket(connection, name, count):
+    cost = Money(TICKET_COST*count)
+    profit = cost.share(PERCENT_PROFIT)
+    guarded_update(connection, QUERIES["charge_account"], (cost, name, cost))
+    guarded_update(connection, QUERIES["credit_account"], (cost-profit, 'Lottery'))
+    guarded_update(connection, QUERIES["credit_account"], (profit, 'IMC'))
+    execute_statement(connection, QUERIES["add_lottery_tickets"], (name, count))
+    record_transaction(connection, name, "lottery ticket", -cost, 'Lottery')
+    record_transaction(connection, 'Lottery', "lottery ticket", cost-profit, name)
+    record_transaction(connection, 'IMC', "lottery ticket", profit, name)
+
+#Admin edits to a balance go through here so the change is recorded in the ledger like any other
+def set_balance(connection, name, amount):
+    account = get_account(connection, name)
+    if account is None:
+        raise OperationRejected(name)
+    if amount != account.money:
+        guarded_update(connection, QUERIES["credit_account"], (amount - account.money, name))
+        record_transaction(connection, name, "adjustment", amount - account.money)
+
+#Picks a ticket uniformly from the open draw by walking cumulative ticket counts in SQL, so only one row per participant is read
+def draw_lottery_winner(connection):
+    totalTickets = execute_statement(connection, QUERIES["count_lottery_tickets"]).fetchone()[0]
+    if totalTickets == 0:
+        return None
+    return execute_statement(connection, QUERIES["pick_lottery_winner"], (random.randrange(totalTickets),)).fetchone()[0]
+
+#The winner is drawn in the same transaction that pays them and closes the draw, so every ticket sold before approval is in it
+def pay_lottery_winner(connection):
+    winner = draw_lottery_winner(connection)
+    if winner is None:
+        raise OperationRejected("No tickets in the open draw")
+    winnings = get_account(connection, 'Lottery').money
+    guarded_update(connection, QUERIES["pay_lottery_winner"], (winner,))
+    record_transaction(connection, winner, "lottery winnings", winnings, 'Lottery')
+    record_transaction(connection, 'Lottery', "lottery winnings", -winnings, winner)
+    execute_statement(connection, QUERIES["empty_lottery_account"])
+    execute_statement(connection, QUERIES["close_lottery_draw"], (winner, winnings))
+    execute_statement(connection, QUERIES["open_lottery_draw"])
+    return {"winner": winner, "winnings": winnings}
+
+#endregion
+
+#region Approvals
+
+#Operations are stored by name so a pending approval can be rebuilt after a restart
+OPERATIONS = {operation.__name__: operation for operation in (deposit, withdraw, transfer, pay_loan, grant_loan, buy_lottery_ticket, pay_lottery_winner, set_balance)}
+
+def save_approval(connection, approval):
+    if approval["type"] == "operation":
+        query, params = approval["query"].__name__, approval["args"]
+    else:
+        query, params = approval["query"], approval.get("params", [])
+    
+    return execute_query(connection, QUERIES["create_approval"], (approval["id"], approval["type"], json.dumps(query), json.dumps(params), approval["channelID"], approval["requestID"], approval["successMessage"], approval["denyMessage"]))
+
+def load_approvals(connection):
+    approvals = {}
+    for messageID, type, query, params, channelID, requestID, successMessage, denyMessage in execute_read_query(connection, QUERIES["get_approvals"]) or []:
+        approval = {
+            "type": type,
+            "id": messageID,
+            "channelID": channelID,
+            "requestID": requestID,
+            "successMessage": successMessage,
+            "denyMessage": denyMessage
+        }
+        if type == "operation":
+            approval["query"] = OPERATIONS[json.loads(query)]
+            approval["args"] = json.loads(params)
+        else:
+            approval["query"] = json.loads(query)
+            approval["params"] = json.loads(params)
+        approvals[messageID] = approval
     
-    await logMessage.reply("Updated")
+    return approvals
+
+#Pending approvals by log message ID; the approvals table is the durable copy
+pendingApprovals = database.run_blocking(load_approvals)
+
+async def request_approval(approval):
+    #Commands pass their invocation context, which wraps the message being replied to
+    context = approval.pop("msg")
+    approval["channelID"] = context.channel.id
+    approval["requestID"] = context.message.id
     
-#endregion 
+    await database.run(save_approval, approval)
+    pendingApprovals[approval["id"]] = approval
+
+#Replies to the command that queued the approval, which may no longer be in the message cache
+async def reply_to_request(approval, content):
+    try:
+        channel = await get_channel(approval["channelID"])
+        await channel.get_partial_message(approval["requestID"]).reply(content)
+    except discord.HTTPException as e:
+        print(f"The error '{e}' occurred")
+
+#endregion
 
 #region Commands
 
@@ -166,6 +1606,7 @@ async def stopCommand(message):
         return
     
     await message.reply("Stopping")
+    await auditLog.drain()
     
     quit()
 
@@ -191,1559 +1632,224 @@ async def creditsCommand(ctx):
     
     await ctx.reply(embed=embedVar)
 
-#region Suggestion Command
-@bot.command(name='suggest', description='Submit a suggestion. WARNING: use quotation marks if it includes more than one word!')
-async def suggestCommand(message, suggestion: str = commands.parameter(description="The suggestion you wish to submit")):
-    channel = await bot.fetch_channel(suggestionID)
-    suggestMessage = await channel.send(suggestion)
-    await suggestMessage.add_reaction('✅')
-    await suggestMessage.add_reaction('❌')
-    
-    await message.reply("Suggestion complete")
+@bot.command(name='queryStats', description='Shows how often SQL statements and accounts are served from cache')
+async def queryStatsCommand(message):
+    if str(message.author.id) not in ADMINS:
+        await message.reply("You lack the permissions to run that command")
+        return
 
-@suggestCommand.error
-async def suggestCommand_error(ctx, error):
-    if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("All arguments not provided, try running the help command")
-#endregion
+    hits, misses, cached, mostUsed = statementCache.report()
+    hitRate = 0 if hits+misses == 0 else round(hits/(hits+misses)*100, 2)
+    accountHits, accountMisses = accountCache.hits, accountCache.misses
+    accountHitRate = 0 if accountHits+accountMisses == 0 else round(accountHits/(accountHits+accountMisses)*100, 2)
 
-#region Complaint Command
-@bot.command(name='complain', description='Submit a complaint. WARNING: use quotation marks if it includes more than one word!')
-async def complainCommand(message, complaint: str = commands.parameter(description="The complaint you wish to submit")):
-    channel = await bot.fetch_channel(complaintID)
-    complainMessage = await channel.send(complaint)
-    await complainMessage.add_reaction('✅')
-    await complainMessage.add_reaction('❌')
-    
-    await message.reply("Suggestion complete")
+    embedVar = discord.Embed(title="Statement Cache", color=0xF5C16A)
+    embedVar.add_field(name="Cache Size", value=f"{sum(cached)} statements on {len(cached)} connections, up to {CACHED_STATEMENTS} each", inline=True)
+    embedVar.add_field(name="Hit Rate", value=f"{hitRate}%", inline=True)
+    embedVar.add_field(name="Hits / Misses", value=f"{hits} / {misses}", inline=True)
 
-@complainCommand.error
-async def complainCommand_error(ctx, error):
-    if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("All arguments not provided, try running the help command")
-#endregion
+    usage = ""
+    for query, count in mostUsed:
+        usage += f"{QUERY_NAMES.get(query, 'custom')}: {count}\n"
 
-#endregion
+    if usage != "":
+        embedVar.add_field(name="Most Used", value=usage, inline=False)
 
-#region Accounts
+    embedVar.add_field(name="Account Cache", value=f"{len(accountCache.entries)}/{ACCOUNT_CACHE_SIZE} accounts", inline=True)
+    embedVar.add_field(name="Account Hit Rate", value=f"{accountHitRate}%", inline=True)
+    embedVar.add_field(name="Account Hits / Misses", value=f"{accountHits} / {accountMisses}", inline=True)
 
-#region Create Account Command
-@bot.command(name='createAccount', description='creates an account')
-async def createAccount(message, name: str = commands.parameter(description="Name for account"), password: str = commands.parameter(description="Password for account"), type: str = commands.parameter(description="Type of account to create")):
+    await message.reply(embed=embedVar)
 
-    checkLogin = f"""
-    SELECT *
-    FROM accounts 
-    WHERE name = '{name}'
-    """
-    check = execute_read_query(connection, checkLogin)
-    
-    if check != []: 
-        await message.reply("Account name is taken. Try again with a new name")
-        return
+STATS_COMMANDS_SHOWN = 8
+STATS_ROUTES_SHOWN = 5
 
-    if type not in accountTypes:
-        await message.reply("Account must be one of the following types: " + str(accountTypes).replace("[","").replace("]","").replace(",",""))
+@bot.command(name='stats', description='Shows how long commands take and how much database and Discord work they do')
+async def statsCommand(message):
+    if str(message.author.id) not in ADMINS:
+        await message.reply("You lack the permissions to run that command")
         return
-    
-    if type == "Checking":
-        interestRate = 0.02
-        maxWithdraw = 512
-        maxDeposit = 512
-        maxTransfer = 512
-    elif type == "Savings":
-        interestRate = 0.04
-        maxWithdraw = 256
-        maxDeposit = 256
-        maxTransfer = 256
-    elif type == "Business":
-        interestRate = 0.02
-        maxWithdraw = 1024
-        maxDeposit = 1024
-        maxTransfer = 1024
-    elif type == "Government":
-        interestRate = 0.02
-        maxWithdraw = 3072
-        maxDeposit = 3072
-        maxTransfer = 3072
-    
-    create_account= f"""
-        INSERT INTO 
-            accounts (name, password, type, money, interestRate, maxWithdraw, maxDeposit, maxTransfer, creditScore, amountWithdrew, amountDeposited, amountTransferred)
-        VALUES
-            ('{name}', '{password}', '{type}', 0, {interestRate}, {maxWithdraw}, {maxDeposit}, {maxTransfer}, 3, 0, 0, 0);"""
-    
-    channel = await bot.fetch_channel(logID)
-    logMessage = await channel.send(f'{message.author.name} would like to open a {type} account with name {name} and password {password}')
-    await logMessage.add_reaction('✅')
-    await logMessage.add_reaction('❌')
-    
-    pendingQueries.append({
-        "type": "single",
-        "query":create_account,
-        "id": logMessage.id,
-        "msg": message,
-        "successMessage": 'Account Created!',
-        "denyMessage": 'Account creation denied. Message bank staff for more details. Sorry for the inconvenience!'
-    })
-    
-    await message.reply(f'Awaiting Approval...')
 
-@createAccount.error
-async def createAccount_error(ctx, error):
-    if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("All arguments not provided, try running the help command")
-#endregion
+    rows, routes, apiErrors = metrics.summary()
+    uptime = int(time.time() - metrics.started)
 
-#region Delete Account Command
-@bot.command(name='deleteAccount', description='deletes an account')
-async def deleteAccount(message, name: str = commands.parameter(description="Name of account"), password: str = commands.parameter(description="Password of account"), reason: str = commands.parameter(description="Why you want to delete it")):
-    
-    checkLogin = f"""
-    SELECT *
-    FROM accounts 
-    WHERE name = '{name}' AND password = '{password}'
-    """
-    check = execute_read_query(connection, checkLogin)
-    
-    if check == []:
-        await message.reply("Incorrect name or password. If you believe that you have the correct name and password, contact bank staff.")
-        return
-    
-    
-    delete_account= f"""
-    DELETE 
-    FROM accounts
-    WHERE password = '{password}' AND name = '{name}'
-    """
-    
-    channel = await bot.fetch_channel(logID)
-    logMessage = await channel.send(f'{message.author.name} would like to delete account \'{name}\' with password {password}. Their reason is \"{reason}\"')
-    await logMessage.add_reaction('✅')
-    await logMessage.add_reaction('❌')
-    
-    pendingQueries.append({
-        "type": "single",
-        "query":delete_account,
-        "id": logMessage.id,
-        "msg": message,
-        "successMessage": f'Account Deleted',
-        "denyMessage": 'Account deletion denied. Message bank staff for more details. Sorry for the inconvenience!'
-    })
-    
-    await message.reply(f'Awaiting Approval...')
+    embedVar = discord.Embed(title="Bot Metrics", color=0xF5C16A)
+    embedVar.add_field(name="Uptime", value=f"{uptime//3600}h {uptime%3600//60}m", inline=True)
+    embedVar.add_field(name="Commands Run", value=f"{sum(row['runs'] for row in rows)} ({sum(row['errors'] for row in rows)} errors)", inline=True)
+    embedVar.add_field(name="Database", value=f"{sum(row['statements'] for row in rows)} statements, {round(sum(row['databaseSeconds'] for row in rows), 2)}s", inline=True)
 
-@deleteAccount.error
-async def deleteAccount_error(ctx, error):
-    if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("All arguments not provided, try running the help command")
-#endregion
+    commandString = ""
+    for row in rows[:STATS_COMMANDS_SHOWN]:
+        if row["runs"] == 0:
+            commandString += f"{row['command']}: {row['errors']} errors, {row['statements']} queries and {row['apiCalls']} API calls\n"
+            continue
+        p95 = "over 10s" if row["p95"] == math.inf else f"under {round(row['p95']*1000)}ms"
+        commandString += f"{row['command']}: {row['runs']} runs, {row['errors']} errors, mean {round(row['mean']*1000, 1)}ms, p95 {p95}, {round(row['statements']/row['runs'], 1)} queries and {round(row['apiCalls']/row['runs'], 1)} API calls per run\n"
 
-#region Balance Command
-@bot.command(name='bal', description='Finds the balance of an account')
-async def accountBalance(message,name: str = commands.parameter(description="Name of account"),password: str = commands.parameter(description="Password of account")):
-    
-    checkLogin = f"""
-    SELECT *
-    FROM accounts 
-    WHERE name = '{name}' AND password = '{password}'
-    """
-    check = execute_read_query(connection, checkLogin)
-    
-    if check == []:
-        await message.reply("Incorrect name or password. If you believe that you have the correct name and password, contact bank staff.")
-        return
-    
-    balance_Query = f"""
-    SELECT money
-    FROM accounts
-    WHERE password = '{password}' AND name = '{name}'
-    """
-    balance = execute_read_query(connection, balance_Query)
-    
-    embedVar = discord.Embed(title=f"{name}", color=0xF5C16A)
-    embedVar.add_field(name="Balance", value=f"{ str(balance).replace("[(","").replace(",)]","") } IMC Denars")
-    
-    loan_Query = f"""
-    SELECT id
-    FROM loans
-    WHERE accountName = '{name}'
-    """
-    loans = execute_read_query(connection, loan_Query)
-    loanString = ""
-    for i in loans:
-        id = str(i).replace("(","").replace(",)","")
-        
-        amountRemaining = float(str(execute_read_query(connection, f"SELECT amountRemaining FROM loans WHERE id = {id}")).replace("[(","").replace(",)]",""))
-        payPercent = float(str(execute_read_query(connection, f"SELECT payPercent FROM loans WHERE id = {id}")).replace("[(","").replace(",)]",""))
-        payAmount = round(amountRemaining*payPercent,2)
-        paid = int(str(execute_read_query(connection, f"SELECT paid FROM loans WHERE id = {id}")).replace("[(","").replace(",)]",""))
-        
-        if paid == 1:
-            paidString = "have"
-        else:
-            paidString = "have not"
+    if commandString != "":
+        embedVar.add_field(name="By Command", value=commandString[:1024], inline=False)
 
-        loanString += "ID: " + id + ";  Amount Remaining: " + str(amountRemaining) + " IMC Denars; You must pay " + str(payAmount) + " IMC Denars before the end of the next two week period and you **" + paidString + "** paid it" + "\n\n"
+    routeString = ""
+    for route, count in routes.most_common(STATS_ROUTES_SHOWN):
+        routeString += f"{route}: {count} calls, {apiErrors[route]} failed\n"
 
-    if loanString != "":
-        embedVar.add_field(name="Loans", value=f"{str(loanString)}", inline=False)
+    if routeString != "":
+        embedVar.add_field(name="Discord API", value=routeString[:1024], inline=False)
 
     await message.reply(embed=embedVar)
 
-@accountBalance.error
-async def bal_error(ctx, error):
-    if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("All arguments not provided, try running the help command")
-#endregion
+#Command groups live in cogs/ and are loaded as extensions, so a fix can be swapped in with reload instead of restarting the bot
+#Shared state like sessions, caches and pending approvals stays in this module and survives a reload
+COGS = ["accounts", "transactions", "loans", "lottery", "feedback"]
 
-#region Account Data Command
-@bot.command(name='accountData', description='Finds the balance of an account')
-async def accountData(message,name: str = commands.parameter(description="Name of account")):
-    
+async def load_cogs():
+    for cog in COGS:
+        if f"cogs.{cog}" not in bot.extensions:
+            await bot.load_extension(f"cogs.{cog}")
+
+@bot.command(name='reload', description='Reloads a group of commands from disk without restarting the bot')
+async def reloadCommand(message, cog: str = commands.parameter(description="Which commands to reload: " + ", ".join(COGS))):
     if str(message.author.id) not in ADMINS:
         await message.reply("You lack the permissions to run that command")
         return
-    
-    checkLogin = f"""
-    SELECT *
-    FROM accounts 
-    WHERE name = '{name}'
-    """
-    check = execute_read_query(connection, checkLogin)
-    
-    if check == []:
-        await message.reply("Unable to find account")
-        return
-    
-    #region Embed
-    
-    balance_Query = f"""
-    SELECT money
-    FROM accounts
-    WHERE name = '{name}'
-    """
-    balance = execute_read_query(connection, balance_Query)
-    
-    embedVar = discord.Embed(title=f"{name}", color=0xF5C16A)
-    embedVar.add_field(name="Balance", value=f"{ str(balance).replace("[(","").replace(",)]","") } IMC Denars", inline=True)
-    
-    type_Query = f"""
-    SELECT type
-    FROM accounts
-    WHERE name = '{name}'
-    """
-    type = execute_read_query(connection, type_Query)
-    embedVar.add_field(name="Type", value=f"{ str(type).replace("'","").replace("[(","").replace(",)]","") }", inline=True)
-                       
-    interestRate_Query = f"""
-    SELECT interestRate
-    FROM accounts
-    WHERE name = '{name}'
-    """
-    interestRate = execute_read_query(connection, interestRate_Query)
-    embedVar.add_field(name="Interest Rate", value=f"{ str(float(str(interestRate).replace("'","").replace("[(","").replace(",)]",""))*100) }%", inline=True)
-    
-    maxWithdraw_Query = f"""
-    SELECT maxWithdraw
-    FROM accounts
-    WHERE name = '{name}'
-    """
-    maxWithdraw = execute_read_query(connection, maxWithdraw_Query)
-    embedVar.add_field(name="Maximum Withdraw", value=f"{ str(maxWithdraw).replace("'","").replace("[(","").replace(",)]","") } IMC Denars", inline=True)
-    
-    maxDeposit_Query = f"""
-    SELECT maxDeposit
-    FROM accounts
-    WHERE name = '{name}'
-    """
-    maxDeposit = execute_read_query(connection, maxDeposit_Query)
-    embedVar.add_field(name="Maximum Deposit", value=f"{ str(maxDeposit).replace("'","").replace("[(","").replace(",)]","") } IMC Denars", inline=True)
-    
-    maxTransfer_Query = f"""
-    SELECT maxTransfer
-    FROM accounts
-    WHERE name = '{name}'
-    """
-    maxTransfer = execute_read_query(connection, maxTransfer_Query)
-    embedVar.add_field(name="Maximum Transfer", value=f"{ str(maxTransfer).replace("'","").replace("[(","").replace(",)]","") } IMC Denars", inline=True)
-    
-    amountWithdrew_Query = f"""
-    SELECT amountWithdrew
-    FROM accounts
-    WHERE name = '{name}'
-    """
-    amountWithdrew = execute_read_query(connection, amountWithdrew_Query)
-    embedVar.add_field(name="Amount Withdrew", value=f"{ str(amountWithdrew).replace("'","").replace("[(","").replace(",)]","") } IMC Denars", inline=True)
-    
-    amountDeposited_Query = f"""
-    SELECT amountDeposited
-    FROM accounts
-    WHERE name = '{name}'
-    """
-    amountDeposited = execute_read_query(connection, amountDeposited_Query)
-    embedVar.add_field(name="Amount Deposited", value=f"{ str(amountDeposited).replace("'","").replace("[(","").replace(",)]","") } IMC Denars", inline=True)
-    
-    amountTransferred_Query = f"""
-    SELECT amountTransferred
-    FROM accounts
-    WHERE name = '{name}'
-    """
-    amountTransferred = execute_read_query(connection, amountTransferred_Query)
-    embedVar.add_field(name="Amount Transferred", value=f"{ str(amountTransferred).replace("'","").replace("[(","").replace(",)]","") } IMC Denars", inline=True)
-    
-    creditScore_Query = f"""
-    SELECT creditScore
-    FROM accounts
-    WHERE name = '{name}'
-    """
-    creditScore = execute_read_query(connection, creditScore_Query)
-    embedVar.add_field(name="Credit Score", value=f"{ str(creditScore).replace("'","").replace("[(","").replace(",)]","") }", inline=True)
-    
-    loan_Query = f"""
-    SELECT id
-    FROM loans
-    WHERE accountName = '{name}'
-    """
-    loans = execute_read_query(connection, loan_Query)
-    loanString = ""
-    for i in loans:
-        id = str(i).replace("(","").replace(",)","")
-        
-        amountRemaining = float(str(execute_read_query(connection, f"SELECT amountRemaining FROM loans WHERE id = {id}")).replace("[(","").replace(",)]",""))
-        payPercent = float(str(execute_read_query(connection, f"SELECT payPercent FROM loans WHERE id = {id}")).replace("[(","").replace(",)]",""))
-        payAmount = round(amountRemaining*payPercent,2)
-        paid = int(str(execute_read_query(connection, f"SELECT paid FROM loans WHERE id = {id}")).replace("[(","").replace(",)]",""))
-        
-        if paid == 1:
-            paidString = "have"
-        else:
-            paidString = "have not"
-
-        loanString += "ID: " + id + ";  Amount Remaining: " + str(amountRemaining) + " IMC Denars; You must pay " + str(payAmount) + " IMC Denars before the end of the next two week period and you **" + paidString + "** paid it" + "\n\n"
 
-    if loanString != "":
-        embedVar.add_field(name="Loans", value=f"{str(loanString)}", inline=False)
+    if cog not in COGS:
+        await message.reply(f"Unknown cog, choose one of: {', '.join(COGS)}")
+        return
 
-    #endregion
+    start = time.perf_counter()
+    try:
+        #If the new code fails to load, discord.py puts the old commands back
+        if f"cogs.{cog}" in bot.extensions:
+            await bot.reload_extension(f"cogs.{cog}")
+        else:
+            await bot.load_extension(f"cogs.{cog}")
+    except commands.ExtensionError as e:
+        print(f"The error '{e}' occurred")
+        await message.reply(f"Could not reload {cog}, the previous version is still running: {e}")
+        return
 
-    await message.reply(embed=embedVar)
+    auditLog.log(f'{message.author.name} reloaded the {cog} commands')
+    await message.reply(f"Reloaded {cog} in {round((time.perf_counter() - start)*1000, 1)}ms")
 
-@accountData.error
-async def accountData_error(ctx, error):
+@reloadCommand.error
+async def reload_error(ctx, error):
     if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("All arguments not provided, try running the help command")
-#endregion
+        await ctx.send(f"All arguments not provided, choose one of: {', '.join(COGS)}")
 
 #endregion
 
-#region Account Data
-
-#region Deposit Command
-@bot.command(name='deposit', description="Deposit money into your account")
-async def depositCommand(message, name: str = commands.parameter(description="Name of account"), password: str = commands.parameter(description="Password of account"), amount: str = commands.parameter(description="Amount to deposit"), atmID: str = commands.parameter(description="ID of where you are depositing it")):
-    try:
-        amount = int(amount)
-        if amount <= 0:
-            await message.reply("Amount must be a positive integer")
-            return
-    except:
-        await message.reply("Amount must be an integer")
-        return
-        
-    checkLogin = f"""
-    SELECT *
-    FROM accounts 
-    WHERE name = '{name}' AND password = '{password}'
-    """
-    check = execute_read_query(connection, checkLogin)
-    
-    if check == []:
-        await message.reply("Incorrect name or password. If you believe that you have the correct name and password, contact bank staff.")
-        return
-    
-    maxDeposit = execute_read_query(connection, f"SELECT maxDeposit FROM accounts WHERE name = '{name}' AND password = '{password}'")
-    maxDeposit = int(str(maxDeposit).replace("[(","").replace(",)]",""))
-    
-    money = execute_read_query(connection, f"SELECT money FROM accounts WHERE name = '{name}' AND password = '{password}'")
-    money = float(str(money).replace("[(","").replace(",)]",""))
-    
-    amountDeposited = execute_read_query(connection, f"SELECT amountDeposited FROM accounts WHERE name = '{name}' AND password = '{password}'")
-    amountDeposited = int(str(amountDeposited).replace("[(","").replace(",)]",""))
+#Builds each borrower one DM covering the interest and late fees about to be applied to their loans
+async def build_loan_notices():
+    loanNotices = defaultdict(list)
     
-    deposit_query = f"""
-    UPDATE accounts
-    SET money = {str(money+amount)},
-        amountDeposited = {str(amount+amountDeposited)}
-    WHERE name = '{name}' AND password = '{password}'
+    for id, discordID, paid, lateFee, newAmount in await database.read(execute_read_query, QUERIES["preview_loan_notices"]):
+        if paid != 1:
+            loanNotices[discordID].append(f"ID: {id}; You did not pay during this period, so a late fee of {str(Money(lateFee))} IMC Denars has been added on top of the interest. You now owe {str(Money(newAmount))} IMC Denars.")
+        else:
+            loanNotices[discordID].append(f"ID: {id}; You now owe {str(Money(newAmount))} IMC Denars.")
     
-    """
-    channel = await bot.fetch_channel(logID)
+    return {discordID: "Your loans have had their interest calculated.\n\n" + "\n\n".join(notices) + "\n\nCheck the balance command on your account to see the amount you need to pay during the next two weeks." for discordID, notices in loanNotices.items()}
+
+async def send_loan_notices():
+    return await send_digests(await build_loan_notices())
+
+#Scheduled version of biWeeklyUpdate, which applies interest without waiting for approval
+AUTO_BIWEEKLY_INTEREST = os.getenv("AUTO_BIWEEKLY_INTEREST", "0") == "1"
+
+#Notices are built from the preview but only sent once the interest has actually been applied
+async def applyBiWeeklyInterest():
+    digests = await build_loan_notices()
     
-    if amount+amountDeposited <= maxDeposit:
-        execute_query(connection, deposit_query)
-        await channel.send(f'{message.author.name} deposited {amount} IMC Denars into account \'{name}\' with password \'{password}\' into ATM with ID {atmID}.')
-        await message.reply("Deposit Completed")
+    if await database.run(execute_query_many, [(QUERIES["apply_loan_interest"], ()), (QUERIES["record_account_interest"], ()), (QUERIES["apply_account_interest"], ())]):
+        delivered, failed = await send_digests(digests)
+        auditLog.log(f'Applied biweekly interest to loans and accounts. Loan notices delivered to {delivered} borrowers, {failed} failed')
     else:
-        logMessage = await channel.send(f'{message.author.name} would like to deposit {amount} IMC Denars into account \'{name}\' with password \'{password}\' into ATM with ID {atmID}.')
-        await logMessage.add_reaction('✅')
-        await logMessage.add_reaction('❌')
-        
-        pendingQueries.append({
-            "type": "single",
-            "query":deposit_query,
-            "id": logMessage.id,
-            "msg": message,
-            "successMessage": f'Deposit Completed',
-            "denyMessage": 'Deposit denied. Message bank staff for more details. Sorry for the inconvenience!'
-        })
-        
-        await message.reply("Awaiting approval because you have surpassed your account's daily limit...")
+        auditLog.log('Biweekly interest could not be applied, so nothing was changed')
 
-@depositCommand.error
-async def deposit_error(ctx, error):
-    if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("All arguments not provided, try running the help command")
 #endregion
 
-#region Withdraw Command
-@bot.command(name='withdraw', description="Withdraw money from your account")
-async def withdrawCommand(message, name: str = commands.parameter(description="Name of account"), password: str = commands.parameter(description="Password of account"), amount: str = commands.parameter(description="Amount to withdraw"), atmID: str = commands.parameter(description="ID of where you are depositing it")):
-    try:
-        amount = int(amount)
-        if amount <= 0:
-            await message.reply("Amount must be a positive integer")
-            return
-    except:
-        await message.reply("Amount must be an integer")
-        return
-        
-    checkLogin = f"""
-    SELECT *
-    FROM accounts 
-    WHERE name = '{name}' AND password = '{password}'
-    """
-    check = execute_read_query(connection, checkLogin)
-    if check == []:
-        await message.reply("Incorrect name or password. If you believe that you have the correct name and password, contact bank staff.")
-        return
-    
-    maxWithdraw = execute_read_query(connection, f"SELECT maxWithdraw FROM accounts WHERE name = '{name}' AND password = '{password}'")
-    maxWithdraw = int(str(maxWithdraw).replace("[(","").replace(",)]",""))
-    
-    money = execute_read_query(connection, f"SELECT money FROM accounts WHERE name = '{name}' AND password = '{password}'")
-    money = float(str(money).replace("[(","").replace(",)]",""))
-    
-    amountWithdrew = execute_read_query(connection, f"SELECT amountWithdrew FROM accounts WHERE name = '{name}' AND password = '{password}'")
-    amountWithdrew = int(str(amountWithdrew).replace("[(","").replace(",)]",""))
+#region Events
+
+@bot.event
+async def on_ready():
     
-    if money < amount:
-        await message.reply("You lack the funds to withdraw that amount. You may want to look into taking a loan.")
+    activity = discord.Game(name="Banking on Cinder")
+    await bot.change_presence(status=discord.Status.online, activity=activity)
+
+scheduler.register("resetDailyMaximums", SECONDS_IN_DAY, updateMaximums)
+if AUTO_BIWEEKLY_INTEREST:
+    scheduler.register("biWeeklyInterest", SECONDS_IN_DAY*14, applyBiWeeklyInterest)
+
+#Runs once per process before connecting, unlike on_ready which fires again on every reconnect
+@bot.event
+async def setup_hook():
+    await load_cogs()
+    scheduler.start()
+    if METRICS_PATH:
+        metrics.start_export(METRICS_PATH, METRICS_INTERVAL)
+
+#The hooks run in the same task as the command, so the command name set here follows every query and API call it makes
+@bot.before_invoke
+async def start_command_metrics(ctx):
+    ctx.metricsStart = time.perf_counter()
+    currentCommand.set(ctx.command.qualified_name)
+
+@bot.after_invoke
+async def finish_command_metrics(ctx):
+    metrics.observe_command(ctx.command.qualified_name, time.perf_counter() - ctx.metricsStart)
+
+#Registering any on_command_error listener turns off discord.py's default handler, so errors without a command specific handler are logged here the same way it would
+@bot.listen()
+async def on_command_error(ctx, error):
+    original = error.original if isinstance(error, commands.CommandInvokeError) else error
+    metrics.record_error(ctx.command.qualified_name if ctx.command else "unknown", type(original).__name__)
+
+    if ctx.command and ctx.command.has_error_handler():
         return
-    
-    withdraw_query = f"""
-    UPDATE accounts
-    SET money = {str(money-amount)},
-        amountWithdrew = {str(amount+amountWithdrew)}
-    WHERE name = '{name}' AND password = '{password}'
-    """
-    channel = await bot.fetch_channel(logID)
-    
-    if amount+amountWithdrew <= maxWithdraw:
-        execute_query(connection, withdraw_query)
-        await channel.send(f'{message.author.name} withdrew {amount} IMC Denars from account \'{name}\' with password \'{password}\' from ATM with ID {atmID}.')
-        await message.reply("Withdraw Completed")
-    else:
-        logMessage = await channel.send(f'{message.author.name} would like to withdraw {amount} IMC Denars from account \'{name}\' with password \'{password}\' from ATM with ID {atmID}.')
-        await logMessage.add_reaction('✅')
-        await logMessage.add_reaction('❌')
-        
-        pendingQueries.append({
-            "type": "single",
-            "query":withdraw_query,
-            "id": logMessage.id,
-            "msg": message,
-            "successMessage": f'Withdraw Completed',
-            "denyMessage": 'Withdraw denied. Message bank staff for more details. The most likely reason is that you withdrew past your max withdraw amount. Sometimes we will allow this, but that is the exception not the rule. Sorry for the inconvenience!'
-        })
-        
-        await message.reply("Awaiting approval because you have surpassed your account's daily limit...")
+    if ctx.cog and ctx.cog.has_error_handler():
+        return
+    logging.getLogger("discord.ext.commands.bot").error("Ignoring exception in command %s", ctx.command, exc_info=error)
 
-@withdrawCommand.error
-async def withdraw_error(ctx, error):
-    if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("All arguments not provided, try running the help command")
-#endregion
+@bot.event
+async def on_guild_channel_delete(channel):
+    resourceCache.invalidate(("channel", channel.id))
 
-#region Transfer Command
-@bot.command(name='transfer', description='Transfer money between accounts')
-async def transferCommand(message, name: str = commands.parameter(description="Name of account"), password: str = commands.parameter(description="Password of account"), recipientName: str = commands.parameter(description="Name of recipient account"), amount: str = commands.parameter(description="Amount to transfer")):
-    try:
-        amount = int(amount)
-        if amount <= 0:
-            await message.reply("Amount must be a positive integer")
-            return
-    except:
-        await message.reply("Amount must be an integer")
+@bot.event
+async def on_private_channel_delete(channel):
+    resourceCache.invalidate(("channel", channel.id))
+
+@bot.event
+async def on_raw_reaction_add(payload):
+    if payload.user_id == bot.user.id:
         return
-        
-    checkLogin = f"""
-    SELECT *
-    FROM accounts 
-    WHERE name = '{name}' AND password = '{password}'
-    """
-    check = execute_read_query(connection, checkLogin)
-    
-    if check == []:
-        await message.reply("Incorrect name or password. If you believe that you have the correct name and password, contact bank staff.")
-        return 
-    
-    checkLogin = f"""
-    SELECT *
-    FROM accounts 
-    WHERE name = '{recipientName}'
-    """
-    check = execute_read_query(connection, checkLogin)
     
-    if check == []:
-        await message.reply("Unable to find recipient. If you believe that you have the correct account name, contact bank staff.")
-        return 
-    
-    maxTransfer = execute_read_query(connection, f"SELECT maxTransfer FROM accounts WHERE name = '{name}' AND password = '{password}'")
-    maxTransfer = int(str(maxTransfer).replace("[(","").replace(",)]",""))
-    
-    money = execute_read_query(connection, f"SELECT money FROM accounts WHERE name = '{name}' AND password = '{password}'")
-    money = float(str(money).replace("[(","").replace(",)]",""))
-    
-    moneyRecipient = execute_read_query(connection, f"SELECT money FROM accounts WHERE name = '{recipientName}'")
-    moneyRecipient = float(str(moneyRecipient).replace("[(","").replace(",)]",""))
+    approval = pendingApprovals.get(payload.message_id)
+    if approval is None:
+        return
     
-    amountTransferred = execute_read_query(connection, f"SELECT amountTransferred FROM accounts WHERE name = '{name}' AND password = '{password}'")
-    amountTransferred = int(str(amountTransferred).replace("[(","").replace(",)]",""))
-    
-    if money < amount:
-        await message.reply("You lack the funds to transfer that amount. You may want to look into taking a loan.")
-        return
-    
-    sender_query = f"""
-    UPDATE accounts SET money = {str(money-amount)}, amountTransferred = {str(amount+amountTransferred)} WHERE name = '{name}' AND password = '{password}';
-    """
-    recipient_query = f"""
-    UPDATE accounts SET money = {str(moneyRecipient+amount)} WHERE name = '{recipientName}';
-    """
-    transfer_query=[sender_query,recipient_query]
-    channel = await bot.fetch_channel(logID)
-    
-    if amount+amountTransferred <= maxTransfer:
-        execute_query_many(connection, transfer_query)
-        await channel.send(f'{message.author.name} transferred {amount} from account \'{name}\' to account \'{recipientName}\'')
-        await message.reply("Transfer Completed")
-    else:
-        logMessage = await channel.send(f'{message.author.name} would like to transfer {amount} IMC Denars from account \'{name}\' to account \'{recipientName}\'')
-        await logMessage.add_reaction('✅')
-        await logMessage.add_reaction('❌')
-        
-        pendingQueries.append({
-            "type": "many",
-            "query":transfer_query,
-            "id": logMessage.id,
-            "msg": message,
-            "successMessage": f'Transfer Completed',
-            "denyMessage": 'Transfer denied. Message bank staff for more details. The most likely reason is that you transferred past your max transfer amount. Sometimes we will allow this, but that is the exception not the rule. Sorry for the inconvenience!'
-        })
-        
-        await message.reply("Awaiting approval because you have surpassed your account's daily limit...")
-
-@transferCommand.error
-async def transfer_error(ctx, error):
-    if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("All arguments not provided, try running the help command")
-#endregion
-
-@bot.command(name='resetDailyMax', description='Resets the withdrew and deposited amount')
-async def resetDailyMaxCommand(message):
-    if str(message.author.id) not in ADMINS:
-        await message.reply("You lack the permissions to run that command")
-        return
-    
-    reset_query = """
-    UPDATE accounts
-    SET amountDeposited = 0,
-        amountWithdrew = 0,
-        amountTransferred = 0"""
-        
-    channel = await bot.fetch_channel(logID)
-    logMessage = await channel.send(f'{message.author.name} would like to reset withdrew and deposited amounts')
-    await logMessage.add_reaction('✅')
-    await logMessage.add_reaction('❌')
-        
-    pendingQueries.append({
-        "type": "single",
-        "query":reset_query,
-        "id": logMessage.id,
-        "msg": message,
-        "successMessage": f'Amounts Reset',
-        "denyMessage": 'Someone declined the request.'
-    })
-    
-    await message.reply("Pending...")
-
-#region Account Edit Command
-@bot.command(name='accountEdit', description='edits account data')
-async def accountEdit(message, name: str = commands.parameter(description="Name of account"), dataToChange: str = commands.parameter(description="Name of data you want to change"), newData: str = commands.parameter(description="Data to change it to")):
-    if str(message.author.id) not in ADMINS:
-        await message.reply("You lack the permissions to run that command")
-        return
-    
-    checkLogin = f"""
-    SELECT *
-    FROM accounts 
-    WHERE name = '{name}'
-    """
-    check = execute_read_query(connection, checkLogin)
-    
-    if check == []: 
-        await message.reply("Account not found")
-        return
-    
-    update_query = f"""    UPDATE accounts SET {dataToChange} = {newData} WHERE name = '{name}'    """
-    
-    channel = await bot.fetch_channel(logID)
-    logMessage = await channel.send(f'{message.author.name} would like to edit the data of account {name}. They wish to change data of {dataToChange} to {newData}')
-    await logMessage.add_reaction('✅')
-    await logMessage.add_reaction('❌')
-        
-    pendingQueries.append({
-        "type": "single",
-        "query":update_query,
-        "id": logMessage.id,
-        "msg": message,
-        "successMessage": f'Update Completed',
-        "denyMessage": 'Update Denied.'
-    })
-    
-    await message.reply("Awaiting Approval...")
-
-@accountEdit.error
-async def accountEdit_error(ctx, error):
-    if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("All arguments not provided, try running the help command")
-#endregion
-
-#region Credit Score Commands
-
-#region Creditscore Increase Command
-@bot.command(name='creditScoreIncrease', description='Increases an accounts credit score')
-async def creditScoreIncrease(message, name: str = commands.parameter(description="Name of account")):
-    if str(message.author.id) not in ADMINS:
-        await message.reply("You lack the permissions to run that command")
-        return
-    
-    checkLogin = f"""
-    SELECT *
-    FROM accounts 
-    WHERE name = '{name}'
-    """
-    check = execute_read_query(connection, checkLogin)
-    
-    if check == []: 
-        await message.reply("Account not found")
-        return
-    
-    creditScore = execute_read_query(connection, f"SELECT creditScore FROM accounts WHERE name = '{name}'")
-    creditScore = int(str(creditScore).replace("[(","").replace(",)]",""))
-    
-    if creditScore+1 > 6:
-        await message.reply("Cannot increase creditscore past 6")
-        return
-    
-    type = execute_read_query(connection, f"SELECT type FROM accounts WHERE name = '{name}'")
-    type = str(type).replace("[(","").replace(",)]","").replace("'","")
-    
-    increment = 32
-    if type == "Checking": increment = 160
-    elif type == "Savings": increment = 64
-    elif type == "Business": increment = 256
-    elif type == "Government": increment = 512
-    
-    maxWithdraw = execute_read_query(connection, f"SELECT maxWithdraw FROM accounts WHERE name = '{name}'")
-    maxWithdraw = int(str(maxWithdraw).replace("[(","").replace(",)]",""))
-    
-    maxDeposit = execute_read_query(connection, f"SELECT maxDeposit FROM accounts WHERE name = '{name}'")
-    maxDeposit = int(str(maxDeposit).replace("[(","").replace(",)]",""))
-    
-    maxTransfer = execute_read_query(connection, f"SELECT maxTransfer FROM accounts WHERE name = '{name}'")
-    maxTransfer = int(str(maxTransfer).replace("[(","").replace(",)]",""))
-    
-    update_query = f"""    
-    UPDATE accounts 
-    SET creditScore = {str(creditScore+1)},
-        maxWithdraw = {str(maxWithdraw+increment)},
-        maxDeposit = {str(maxDeposit+increment)},
-        maxTransfer = {str(maxTransfer+increment)}   
-    WHERE name = '{name}'    """
-    
-    channel = await bot.fetch_channel(logID)
-    logMessage = await channel.send(f'{message.author.name} would like to increase the credit score of account {name}. Their new credit score will be {str(creditScore+1)}')
-    await logMessage.add_reaction('✅')
-    await logMessage.add_reaction('❌')
-    
-    pendingQueries.append({
-        "type": "single",
-        "query":update_query,
-        "id": logMessage.id,
-        "msg": message,
-        "successMessage": f'Update Completed',
-        "denyMessage": 'Update Denied.'
-    })
-    
-    await message.reply("Awaiting Approval...")
-
-@creditScoreIncrease.error
-async def creditScoreIncrease_error(ctx, error):
-    if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("All arguments not provided, try running the help command")
-#endregion
-
-#region Creditscore Decrease Command
-@bot.command(name='creditScoreDecrease', description='Decreases an accounts credit score')
-async def creditScoreDecrease(message, name: str = commands.parameter(description="Name of account")):
-    if str(message.author.id) not in ADMINS:
-        await message.reply("You lack the permissions to run that command")
-        return
-    
-    checkLogin = f"""
-    SELECT *
-    FROM accounts 
-    WHERE name = '{name}'
-    """
-    check = execute_read_query(connection, checkLogin)
-    
-    if check == []: 
-        await message.reply("Account not found")
-        return
-    
-    creditScore = execute_read_query(connection, f"SELECT creditScore FROM accounts WHERE name = '{name}'")
-    creditScore = int(str(creditScore).replace("[(","").replace(",)]",""))
-    
-    if creditScore-1 < 0:
-        await message.reply("Cannot decrease creditscore below 0")
-        return
-    
-    type = execute_read_query(connection, f"SELECT type FROM accounts WHERE name = '{name}'")
-    type = str(type).replace("[(","").replace(",)]","").replace("'","")
-    
-    increment = 32
-    if type == "Checking": increment = 160
-    elif type == "Savings": increment = 64
-    elif type == "Business": increment = 256
-    elif type == "Government": increment = 512
-    
-    maxWithdraw = execute_read_query(connection, f"SELECT maxWithdraw FROM accounts WHERE name = '{name}'")
-    maxWithdraw = int(str(maxWithdraw).replace("[(","").replace(",)]",""))
-    
-    maxDeposit = execute_read_query(connection, f"SELECT maxDeposit FROM accounts WHERE name = '{name}'")
-    maxDeposit = int(str(maxDeposit).replace("[(","").replace(",)]",""))
-    
-    maxTransfer = execute_read_query(connection, f"SELECT maxTransfer FROM accounts WHERE name = '{name}'")
-    maxTransfer = int(str(maxTransfer).replace("[(","").replace(",)]",""))
-    
-    update_query = f"""    
-    UPDATE accounts 
-    SET creditScore = {str(creditScore-1)},
-        maxWithdraw = {str(maxWithdraw-increment)},
-        maxDeposit = {str(maxDeposit-increment)},
-        maxTransfer = {str(maxTransfer-increment)}   
-    WHERE name = '{name}'    """
-    
-    channel = await bot.fetch_channel(logID)
-    logMessage = await channel.send(f'{message.author.name} would like to decrease the credit score of account {name}. Their new credit score will be {str(creditScore-1)}')
-    await logMessage.add_reaction('✅')
-    await logMessage.add_reaction('❌')
-    
-    pendingQueries.append({
-        "type": "single",
-        "query":update_query,
-        "id": logMessage.id,
-        "msg": message,
-        "successMessage": f'Update Completed',
-        "denyMessage": 'Update Denied.'
-    })
-    
-    await message.reply("Awaiting Approval...")
-
-@creditScoreDecrease.error
-async def creditScoreDecrease_error(ctx, error):
-    if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("All arguments not provided, try running the help command")
-#endregion
-
-#endregion
-
-#endregion
-
-#region Gambling
-
-'''
-#region Dice Roll Command
-@bot.command(name='dice', description='gamble on a dice roll')
-async def diceRoll(message, name: str = commands.parameter(description="Name of account"), password: str = commands.parameter(description="Password of account"), guess: str = commands.parameter(description="Which number you would like to bet on"), betAmount: str = commands.parameter(description="How much you would like to bet")):
-    
-    try:
-        guess = int(guess)
-
-    except:
-        await message.reply("Guess must be an integer")
-        return
-        
-    try:
-        betAmount = int(betAmount)
-        if betAmount <= 0:
-            await message.reply("Bet amount must be a positive integer")
-            return
-    except:
-        await message.reply("Bet amount must be a positive integer")
-        return
-    
-    if guess not in range(1,7):
-        await message.reply("Guess must be a number in the range [1,6]")
-        return
-    
-    checkLogin = f"""
-    SELECT *
-    FROM accounts 
-    WHERE name = '{name}'"""
-    
-    check = execute_read_query(connection, checkLogin)
-    if check == []: 
-        await message.reply("Account not found")
-        return
-    
-    money = execute_read_query(connection, f"SELECT money FROM accounts WHERE name = '{name}' AND password = '{password}'")
-    money = float(str(money).replace("[(","").replace(",)]",""))
-    
-    if money < betAmount:
-        await message.reply("You lack the funds for that transaction.")
-        return
-    
-    roll = random.randint(1,6)
-    
-    channel = await bot.fetch_channel(logID)
-    
-    if roll == guess:
-        money += betAmount*2
-        await message.reply(f"The dice rolled {str(roll)}. You win! Your money got tripled! You now have {str(money)} IMC Denars")
-        await channel.send(f"{message.author.name} won {str(betAmount)} on a dice roll! They now have {str(money)} IMC Denars")
-    else:
-        money -= betAmount
-        await message.reply(f"The dice rolled {str(roll)}. You lost {str(betAmount)} IMC Denars...")
-        await channel.send(f"{message.author.name} lost {str(betAmount)} on a dice roll! They now have {str(money)} IMC Denars")
-        
-    gamble_query = f"""
-    UPDATE accounts
-    SET money = {str(money)}
-    WHERE name = '{name}' AND password = '{password}'
-    """
-    
-    execute_query(connection, gamble_query)
-
-@diceRoll.error
-async def diceRoll_error(ctx, error):
-    if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("All arguments not provided, try running the help command")
-#endregion
-'''
-
-#region Lottery
-
-TICKET_COST = 8
-PERCENT_PROFIT = 0.1
-
-#region Buy Lottery Ticket Command
-@bot.command(name='buyLotteryTicket', description='buy a lottery ticket')
-async def buyLotteryTicket(message, name: str = commands.parameter(description="Name of account"), password: str = commands.parameter(description="Password of account")):
-    
-    checkLogin = f"""
-    SELECT *
-    FROM accounts 
-    WHERE name = '{name}'"""
-    
-    check = execute_read_query(connection, checkLogin)
-    if check == []: 
-        await message.reply("Incorrect username or password.")
-        return
-    
-    money = execute_read_query(connection, f"SELECT money FROM accounts WHERE name = '{name}' AND password = '{password}'")
-    money = float(str(money).replace("[(","").replace(",)]",""))
-    
-    if money - TICKET_COST < 0:
-        await message.reply("You lack the funds for that transaction")
-        return
-    
-    createTicket_Query= f"""
-    INSERT INTO 
-        lottery (accountName)
-    VALUES
-        ('{name}');"""
-            
-    pay_Query=f"""
-    UPDATE accounts
-    SET money = {str(round(money-TICKET_COST,2))}
-    WHERE name = '{name}' AND password = '{password}'
-    """
-    
-    moneyLottery = execute_read_query(connection, f"SELECT money FROM accounts WHERE name = 'Lottery'")
-    moneyLottery = round(float(str(moneyLottery).replace("[(","").replace(",)]","")),2)
-    
-    lottery_Query=f"""
-    UPDATE accounts
-    SET money = {str( moneyLottery+(TICKET_COST*(1-PERCENT_PROFIT)) )}
-    WHERE name = 'Lottery'
-    """
-    
-    moneyIMC = execute_read_query(connection, f"SELECT money FROM accounts WHERE name = 'IMC'")
-    moneyIMC = round(float(str(moneyIMC).replace("[(","").replace(",)]","")),2)
-    
-    IMC_Query=f"""
-    UPDATE accounts
-    SET money = {str( moneyIMC+(TICKET_COST*PERCENT_PROFIT) )}
-    WHERE name = 'IMC'
-    """
-    
-    queries=[createTicket_Query, pay_Query, lottery_Query, IMC_Query]
-            
-    execute_query_many(connection, queries)
-    
-    await message.reply("Ticket Purchased")
-
-@buyLotteryTicket.error
-async def buyLotteryTicket_error(ctx, error):
-    if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("All arguments not provided, try running the help command")
-#endregion
-
-#region End Lottery Command
-@bot.command(name='endLottery', description='Rolls for a lottery winner and deposits the money')
-async def endLottery(message):
-    
-    if str(message.author.id) not in ADMINS:
-        await message.reply("You lack the permissions to run that command")
-        return
-    
-    tickets = execute_read_query(connection, "SELECT accountName FROM lottery")
-    randNumber = random.randint(1,len(tickets))
-    
-    name = str(tickets[randNumber]).replace("(","").replace(",)","")
-      
-    winnings = execute_read_query(connection, f"SELECT money FROM accounts WHERE name = 'Lottery'")
-    winnings = str(round(float(str(winnings).replace("[(","").replace(",)]","")),2))
-                                                                             
-    win_Query= f"UPDATE accounts SET money = money + {winnings} WHERE name = {name}"
-    pay_Query = "UPDATE accounts SET money = 0 WHERE name = 'Lottery'"
-    delete_Query= "DELETE FROM lottery"
-    
-    queries = [win_Query,pay_Query,delete_Query]
-    
-    channel = await bot.fetch_channel(logID)
-    logMessage = await channel.send(f'{message.author.name} would like to end the lottery and roll a winner')
-    await logMessage.add_reaction('✅')
-    await logMessage.add_reaction('❌')
-    
-    pendingQueries.append({
-        "type": "many",
-        "query":queries,
-        "id": logMessage.id,
-        "msg": message,
-        "successMessage": f"The winner is the account with name {name} and they won {winnings} IMC Denars",
-        "denyMessage": 'Lottery roll denied'
-    })
-    
-    await message.reply("Awaiting Approval...")
-
-@endLottery.error
-async def endLottery_error(ctx, error):
-    if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("All arguments not provided, try running the help command")
-#endregion
-
-#endregion
-
-#endregion
-
-#region Loans
-
-LOAN_FEE = 4
-
-#region Loan Apply
-@bot.command(name='loanApply', description='Apply for a loan')
-async def loanApply(message, 
-                    name: str = commands.parameter(description="Name of account"), 
-                    password: str = commands.parameter(description="Password of account"), 
-                    amount: str = commands.parameter(description="Amount you would like to take out a loan for"), 
-                    reason: str = commands.parameter(description="Why you need the loan")):
-    
-    try:
-        amount = int(amount)
-        if amount <= 0:
-            await message.reply("Amount must be a positive integer")
-            return
-    except:
-        await message.reply("Amount must be a positive integer")
-        return
-    
-    checkLogin = f"""
-    SELECT *
-    FROM accounts 
-    WHERE name = '{name}' AND password = '{password}'"""
-    
-    check = execute_read_query(connection, checkLogin)
-    if check == []: 
-        await message.reply("Account not found")
-        return
-    
-    creditScore = execute_read_query(connection, f"SELECT creditScore FROM accounts WHERE name = '{name}' AND password = '{password}'")
-    creditScore = int(str(creditScore).replace("[(","").replace(",)]",""))
-    
-    payPercent = 0;
-    lateFee = 0;
-    interestRate = 0;
-    if creditScore == 0:
-        interestRate = 0.2
-        payPercent = 0.15
-        lateFee = math.floor(amount*0.2)
-    elif creditScore == 1:
-        interestRate = 0.15
-        payPercent = 0.11
-        lateFee = math.floor(amount*0.15)
-    elif creditScore == 2:
-        interestRate = 0.125
-        payPercent = 0.09
-        lateFee = math.floor(amount*0.125)
-    elif creditScore == 3:
-        interestRate = 0.1
-        payPercent = 0.075
-        lateFee = math.floor(amount*0.1)
-    elif creditScore == 4:
-        interestRate = 0.08
-        payPercent = 0.06
-        lateFee = math.floor(amount*0.08)
-    elif creditScore == 5:
-        interestRate = 0.07
-        payPercent = 0.05
-        lateFee = math.floor(amount*0.07)
-    elif creditScore == 6:
-        interestRate = 0.05
-        payPercent = 0.05
-        lateFee = math.floor(amount*0.05)
-        
-    createLoan_query= f"""
-    INSERT INTO 
-        loans (accountName, interestRate, originalAmount, amountRemaining, discordID, payPercent, lateFee, paid)
-    VALUES
-        ('{name}', {str(interestRate)}, {str(amount)}, {str(amount+LOAN_FEE)}, {message.author.id}, {str(payPercent)}, {str(lateFee)}, 0);"""   
-    
-    money = execute_read_query(connection, f"SELECT money FROM accounts WHERE name = '{name}' AND password = '{password}'")
-    money = float(str(money).replace("[(","").replace(",)]",""))
-        
-    sendMoney_query= f"""
-    UPDATE accounts SET money = {str(money+amount)} WHERE name = '{name}' AND password = '{password}';
-    """
-    
-    money = execute_read_query(connection, f"SELECT money FROM accounts WHERE name = 'IMC'")
-    money = float(str(money).replace("[(","").replace(",)]",""))
-    
-    IMCMoney_query= f"""
-    UPDATE accounts SET money = {str(money-amount)} WHERE name = 'IMC';
-    """
-        
-    loan_query = [createLoan_query, sendMoney_query, IMCMoney_query]
-    
-    channel = await bot.fetch_channel(logID)
-    logMessage = await channel.send(f'{message.author.name} would like to get a loan on an account with name {name} and password {password} for {str(amount)} IMC Denars. They have a credit score of {str(creditScore)}. They want this loan because {reason}')
-    await logMessage.add_reaction('✅')
-    await logMessage.add_reaction('❌')
-    
-    pendingQueries.append({
-        "type": "many",
-        "query":loan_query,
-        "id": logMessage.id,
-        "msg": message,
-        "successMessage": 'Loan Approved!',
-        "denyMessage": 'Loan denied. Message bank staff for more details. Sorry for the inconvenience!'
-    })
-    
-    await message.reply("Awaiting Approval...")
-
-@loanApply.error
-async def loanApply_error(ctx, error):
-    if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("All arguments not provided, try running the help command")
-#endregion
-
-#region Loan Negotiate
-@bot.command(name='loanNegotiate', description='Apply for a loan where you negotiate the terms')
-async def loanNegotiate(message, 
-                    name: str = commands.parameter(description="Name of account"), 
-                    password: str = commands.parameter(description="Password of account"), 
-                    amount: str = commands.parameter(description="Amount you would like to take out a loan for"), 
-                    interestRate: str = commands.parameter(description="Starting offer interest rate"), 
-                    payPercent: str = commands.parameter(description="Starting offer minimum monthly payment"), 
-                    lateFee: str = commands.parameter(description="Starting offer late fee"), 
-                    reason: str = commands.parameter(description="Why you need a loan")):
-    
-    try:
-        amount = int(amount)
-        if amount <= 0:
-            await message.reply("Amount must be a positive integer")
-            return
-    except:
-        await message.reply("Amount must be a positive integer")
-        return
-    
-    try:
-        interestRate = float(interestRate)
-        if interestRate <= 0:
-            await message.reply("Interest Rate must be a positive decimal value")
-            return
-    except:
-        await message.reply("Interest Rate must be a positive decimal value")
-        return
-    
-    try:
-        payPercent = float(payPercent)
-        if payPercent <= 0:
-            await message.reply("Pay Percent must be a positive decimal value")
-            return
-    except:
-        await message.reply("Pay Percent must be a positive decimal value")
-        return
-    
-    try:
-        lateFee = int(lateFee)
-        if lateFee <= 0:
-            await message.reply("Late Fee must be a positive integer")
-            return
-    except:
-        await message.reply("Late Fee must be a positive integer")
-        return
-    
-    checkLogin = f"""
-    SELECT *
-    FROM accounts 
-    WHERE name = '{name}' AND password = '{password}'"""
-    
-    check = execute_read_query(connection, checkLogin)
-    if check == []: 
-        await message.reply("Account not found")
-        return
-    
-    creditScore = execute_read_query(connection, f"SELECT creditScore FROM accounts WHERE name = '{name}' AND password = '{password}'")
-    creditScore = int(str(creditScore).replace("[(","").replace(",)]",""))
-        
-    createLoan_query= f"""
-    INSERT INTO 
-        loans (accountName, interestRate, originalAmount, amountRemaining, discordID, payPercent, lateFee, paid)
-    VALUES
-        ('{name}', {str(interestRate)}, {str(amount)}, {str(amount+LOAN_FEE)}, {message.author.id}, {str(payPercent)}, {str(lateFee)}, 0);""" 
-        
-    money = execute_read_query(connection, f"SELECT money FROM accounts WHERE name = '{name}' AND password = '{password}'")
-    money = float(str(money).replace("[(","").replace(",)]",""))
-        
-    sendMoney_query= f"""
-    UPDATE accounts SET money = {str(money+amount)} WHERE name = '{name}' AND password = '{password}';
-    """
-    
-    money = execute_read_query(connection, f"SELECT money FROM accounts WHERE name = 'IMC'")
-    money = float(str(money).replace("[(","").replace(",)]",""))
-    
-    IMCMoney_query= f"""
-    UPDATE accounts SET money = {str(money-amount)} WHERE name = 'IMC';
-    """
-        
-    loan_query = [createLoan_query, sendMoney_query, IMCMoney_query]
-        
-    channel = await bot.fetch_channel(logID)
-    logMessage = await channel.send(f'{message.author.name} would like to **negotiate** a loan on an account with name {name} and password {password} for {str(amount)} IMC Denars. They have a credit score of {str(creditScore)}. They want an interest rate of {str(interestRate)}, a monthly pay percent of {str(payPercent)}, and a late fee of {str(lateFee)}. The reason they want the loan is \'{reason}\'')
-    await logMessage.add_reaction('✅')
-    await logMessage.add_reaction('❌')
-    
-    pendingQueries.append({
-        "type": "many",
-        "query":loan_query,
-        "id": logMessage.id,
-        "msg": message,
-        "successMessage": 'Loan Approved!',
-        "denyMessage": 'Loan denied. Message bank staff for more details. Sorry for the inconvenience!'
-    })
-    
-    await message.reply("Finding Bank Staff. Someone will message you to negotiate shortly")
-
-@loanNegotiate.error
-async def loanNegotiate_error(ctx, error):
-    if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("All arguments not provided, try running the help command")
-#endregion
-
-#region Loan Delete
-@bot.command(name='loanDelete', description='Delete a loan')
-async def loanDelete(message, 
-                        id: str = commands.parameter(description="ID of loan"), 
-                        reason: str = commands.parameter(description="Reason for deleting loan")):
-    
-    if str(message.author.id) not in ADMINS:
-        await message.reply("You lack the permissions to run that command")
-        return
-    
-    checkLoan = f"""
-    SELECT *
-    FROM loans
-    WHERE id = {id}
-    """
-    check = execute_read_query(connection, checkLoan)
-    
-    if check == []:
-        await message.reply("Unable to find loan.")
-        return
-    
-    delete_loan= f"""
-    DELETE 
-    FROM loans
-    WHERE id = {id}
-    """
-    
-    channel = await bot.fetch_channel(logID)
-    logMessage = await channel.send(f'{message.author.name} would like to delete loan ID {id}. Their reason is \"{reason}\"')
-    await logMessage.add_reaction('✅')
-    await logMessage.add_reaction('❌')
-    
-    pendingQueries.append({
-        "type": "single",
-        "query":delete_loan,
-        "id": logMessage.id,
-        "msg": message,
-        "successMessage": f'Loan Deleted',
-        "denyMessage": 'Loan deletion denied. Message bank staff for more details. Sorry for the inconvenience!'
-    })
-    
-    await message.reply(f'Awaiting Approval...')
-
-@loanDelete.error
-async def loanDelete_error(ctx, error):
-    if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("All arguments not provided, try running the help command")
-#endregion
-
-#region Loan Pay
-@bot.command(name='payLoan', description='Pays back part of your loan')
-async def payLoan(message,
-                    name: str = commands.parameter(description="Name of account"),
-                    password: str = commands.parameter(description="Password of account"),
-                    id: str = commands.parameter(description="ID of loan you wish to pay"),
-                    amount: str = commands.parameter(description="Amount you would like to pay back")):
-    
-    try: int(id)
-    except: 
-        await message.reply("ID must be an integer")
-        return
-    
-    try: 
-        amount = int(amount)
-        if amount <= 0:
-            await message.reply("Amount must be a positive integer")
-            return
-    except: 
-        await message.reply("Amount must be an integer")
-        return
-    
-    checkLogin = f"""
-    SELECT *
-    FROM accounts 
-    WHERE name = '{name}' AND password = '{password}'
-    """
-    check = execute_read_query(connection, checkLogin)
-    
-    if check == []:
-        await message.reply("Incorrect name or password. If you believe that you have the correct name and password, contact bank staff.")
-        return
-    
-    checkLoan = f"""
-    SELECT amountRemaining
-    FROM loans 
-    WHERE id = {id} AND accountName = '{name}'
-    """
-    check = execute_read_query(connection, checkLoan)
-    
-    if check == []:
-        await message.reply("Unable to find loan or loan is not on this account")
-        return
-    
-    amountRemaining = float(str(check).replace("[(","").replace(",)]",""))
-    
-    if amount > amountRemaining:
-        await message.reply("You cannot pay back more money than is remaining on the loan")
-        return
-    
-    payPercent = execute_read_query(connection, f"SELECT payPercent FROM loans WHERE id = {id} AND accountName = '{name}'")
-    payPercent = float(str(payPercent).replace("[(","").replace(",)]",""))
-    
-    if (amount < amountRemaining*payPercent) and (amountRemaining-amount >= amountRemaining*payPercent):
-        await message.reply("You cannot pay less than your minimum pay percent")
-        return
-    
-    money = execute_read_query(connection, f"SELECT money FROM accounts WHERE name = '{name}' AND password = '{password}'")
-    money = float(str(money).replace("[(","").replace(",)]",""))
-    
-    if money-amount < 0:
-        await message.reply("You lack the funds for that transaction")
-        return
-    
-    IMCmoney = execute_read_query(connection, f"SELECT money FROM accounts WHERE name = 'IMC'")
-    IMCmoney = float(str(IMCmoney).replace("[(","").replace(",)]",""))
-    
-    pay_Query=f"UPDATE accounts SET money = {str(round(money-amount,2))} WHERE name = '{name}' AND password = '{password}';"
-    recieve_Query=f"UPDATE accounts SET money = {str(round(IMCmoney+amount,2))} WHERE name = 'IMC';"
-    loan_Query=f"UPDATE loans SET amountRemaining = {str(round(amountRemaining-amount,2))}, paid = 1 WHERE id = {id} AND accountName = '{name}';"
-    
-    queries = [pay_Query,recieve_Query,loan_Query]
-    execute_query_many(connection,queries)
-    
-    channel = await bot.fetch_channel(logID)
-    await channel.send(f'{message.author.name} has paid back part of loan ID: {id}. It has {str(round(amountRemaining-amount,2))} IMC Denars remaining.')
-    
-    await message.reply("Loan Payment Completed")
-    
-    if amountRemaining-amount < 1:
-        execute_query(connection, f"DELETE FROM loans WHERE id = {id}")
-        await message.reply("Loan fully paid!")
-
-@payLoan.error
-async def payLoan_error(ctx, error):
-    if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("All arguments not provided, try running the help command")
-#endregion
-
-#region Loan Edit Command
-@bot.command(name='loanEdit', description='Edits loan data')
-async def loanEdit(message, 
-                      id: str = commands.parameter(description="ID of loan"), 
-                      dataToChange: str = commands.parameter(description="Name of data you want to change"), 
-                      newData: str = commands.parameter(description="Data to change it to")):
-    
-    if str(message.author.id) not in ADMINS:
-        await message.reply("You lack the permissions to run that command")
-        return
-    
-    checkLogin = f"""
-    SELECT *
-    FROM loans
-    WHERE id = {id}
-    """
-    check = execute_read_query(connection, checkLogin)
-    
-    if check == []: 
-        await message.reply("Loan not found")
-        return
-    
-    update_query = f"""    UPDATE loans SET {dataToChange} = {newData} WHERE id = {id}    """
-    
-    channel = await bot.fetch_channel(logID)
-    logMessage = await channel.send(f'{message.author.name} would like to edit the data of loan ID: {id}. They wish to change data of {dataToChange} to {newData}')
-    await logMessage.add_reaction('✅')
-    await logMessage.add_reaction('❌')
-        
-    pendingQueries.append({
-        "type": "single",
-        "query":update_query,
-        "id": logMessage.id,
-        "msg": message,
-        "successMessage": f'Update Completed',
-        "denyMessage": 'Update Denied.'
-    })
-    
-    await message.reply("Awaiting Approval...")
-
-@loanEdit.error
-async def loanEdit_error(ctx, error):
-    if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("All arguments not provided, try running the help command")
-#endregion
-
-#endregion
-
-@bot.command(name='biWeeklyUpdate', description='Update loans and account holdings with interest')
-async def biWeeklyUpdate(message):
-    
-    if str(message.author.id) not in ADMINS:
-        await message.reply("You lack the permissions to run that command")
-        return
-    
-    channel = await bot.fetch_channel(logID)
-    
-    loan_Queries=[]
-    
-    listLoans_Query = f"""
-    SELECT id
-    FROM loans
-    """
-    loans = execute_read_query(connection, listLoans_Query)
-    
-    for i in loans:
-        id = str(i).replace("(","").replace(",)","")
-        
-        amountRemaining = execute_read_query(connection, f"SELECT amountRemaining FROM loans WHERE id = {id}")
-        amountRemaining = float(str(amountRemaining).replace("[(","").replace(",)]",""))
-        
-        interestRate = execute_read_query(connection, f"SELECT interestRate FROM loans WHERE id = {id}")
-        interestRate = float(str(interestRate).replace("[(","").replace(",)]",""))
-        
-        paid = execute_read_query(connection, f"SELECT paid FROM loans WHERE id = {id}")
-        paid = int(str(paid).replace("[(","").replace(",)]",""))
-        
-        discordID = execute_read_query(connection, f"SELECT discordID FROM loans WHERE id = {id}")
-        discordID = int(str(discordID).replace("[(","").replace(",)]",""))
-        discordUser = bot.get_user(discordID)
-        await discordUser.create_dm()
-        
-        newAmount = round(amountRemaining+(amountRemaining*interestRate),2)
-        if paid != 1:
-            lateFee = execute_read_query(connection, f"SELECT lateFee FROM loans WHERE id = {id}")
-            lateFee = int(str(lateFee).replace("[(","").replace(",)]",""))
-            newAmount += lateFee
-            
-            await discordUser.dm_channel.send(f"Your loan with ID: {id} has had its interest calculated. You did not pay during this period, so a late fee of {str(lateFee)} IMC Denars has been added on top of the interest. You now owe {str(newAmount)} IMC Denars. Check the balance command on your account to see the amount you need to pay during the next two weeks.")
+    if str(payload.emoji) == '✅':
+        del pendingApprovals[payload.message_id]
+        await database.run(execute_query, QUERIES["delete_approval"], (payload.message_id,))
+        if approval["type"]=="operation":
+            success = await database.run(execute_operation, approval["query"], *approval["args"])
+        elif approval["type"]=="many":
+            success = await database.run(execute_query_many, approval["query"])
         else:
-            await discordUser.dm_channel.send(f"Your loan with ID: {id} has had its interest calculated. You now owe {str(newAmount)} IMC Denars. Check the balance command on your account to see the amount you need to pay during the next two weeks.")
-        loan_Query=f"UPDATE loans SET amountRemaining = {str(newAmount)}, paid = 0 WHERE id = {id};"
-        
-        loan_Queries.append(loan_Query)
-    
-    logMessage = await channel.send(f'{message.author.name} would like to update loan interests')
-    await logMessage.add_reaction('✅')
-    await logMessage.add_reaction('❌')
-    
-    pendingQueries.append({
-        "type": "many",
-        "query":loan_Queries,
-        "id": logMessage.id,
-        "msg": message,
-        "successMessage": f'Update Completed',
-        "denyMessage": 'Update Denied'
-    })
-    
-    account_Queries=[]
-    
-    listAccounts_Query = f"""
-    SELECT name
-    FROM accounts
-    """
-    accounts = execute_read_query(connection, listAccounts_Query)
-    
-    for i in accounts:
-        name = str(i).replace("(","").replace(",)","")
-                
-        money = execute_read_query(connection, f"SELECT money FROM accounts WHERE name = {name}")
-        money = float(str(money).replace("[(","").replace(",)]",""))
-
-        interestRate = execute_read_query(connection, f"SELECT interestRate FROM accounts WHERE name = {name}")
-        interestRate = float(str(interestRate).replace("[(","").replace(",)]",""))
-        
-        newAmount = round(money+(money*interestRate),2)
-        
-        account_Query=f"UPDATE accounts SET money = {str(newAmount)} WHERE name = {name};"
-        
-        account_Queries.append(account_Query)
-    
-    logMessage = await channel.send(f'{message.author.name} would like to update account holdings for interest')
-    await logMessage.add_reaction('✅')
-    await logMessage.add_reaction('❌')
-    
-    pendingQueries.append({
-        "type": "many",
-        "query":account_Queries,
-        "id": logMessage.id,
-        "msg": message,
-        "successMessage": f'Update Completed',
-        "denyMessage": 'Update Denied'
-    })
-    
-    await message.reply(f'Pending...')
-
-#endregion
-
-#region Events
-
-@bot.event
-async def on_ready():
-    
-    #region Setup IMC bank account
-    
-    checkLogin = f"""
-    SELECT *
-    FROM accounts 
-    WHERE name = 'IMC'
-    """
-    
-    check = execute_read_query(connection, checkLogin)
-    
-    if check == []: 
-        
-        create_account= f"""
-        INSERT INTO 
-            accounts (name, password, type, money, interestRate, maxWithdraw, maxDeposit, maxTransfer, creditScore, amountWithdrew, amountDeposited, amountTransferred)
-        VALUES
-            ('IMC', '{os.getenv("IMC_PASSWORD")}', 'Official', 0, 0, 101376, 101376, 101376, 3, 0, 0, 0);"""
-            
-        execute_query(connection, create_account)
-        
-    #endregion
-    
-    #region Setup Lottery bank account
-    
-    checkLogin = f"""
-    SELECT *
-    FROM accounts 
-    WHERE name = 'Lottery'
-    """
-    
-    check = execute_read_query(connection, checkLogin)
-    
-    if check == []: 
-        
-        create_account= f"""
-        INSERT INTO 
-            accounts (name, password, type, money, interestRate, maxWithdraw, maxDeposit, maxTransfer, creditScore, amountWithdrew, amountDeposited, amountTransferred)
-        VALUES
-            ('Lottery', '{os.getenv("LOTTERY_PASSWORD")}', 'Official', 0, 0, 101376, 101376, 101376, 3, 0, 0, 0);"""
-            
-        execute_query(connection, create_account)
-        
-    #endregion
-    
-    activity = discord.Game(name="Banking on Cinder")
-    await bot.change_presence(status=discord.Status.online, activity=activity)
-    
-    await start_daily_cycle()
+            success = await database.run(execute_query_many, [(approval["query"], approval["params"])])
 
-@bot.event
-async def on_reaction_add(reaction, user):
-    if(user == bot.user):
-        return
-    
-    for i in pendingQueries:
-        if i["id"] == reaction.message.id:
-            if reaction.emoji == '✅':
-                if i["type"]=="many":
-                    execute_query_many(connection, i["query"])
-                else:
-                    execute_query(connection, i["query"])
-                await i["msg"].reply(i["successMessage"])
-                pendingQueries.remove(i)
-            elif reaction.emoji == '❌':
-                await i["msg"].reply(i["denyMessage"])
-                pendingQueries.remove(i)
-            
-            return
+        if isinstance(success, dict):
+            await reply_to_request(approval, approval["successMessage"].format(**success))
+        elif success:
+            await reply_to_request(approval, approval["successMessage"])
+        else:
+            await reply_to_request(approval, "This request could not be applied (the account may no longer exist or lack the funds), so nothing was changed. Please contact bank staff.")
+    elif str(payload.emoji) == '❌':
+        del pendingApprovals[payload.message_id]
+        await database.run(execute_query, QUERIES["delete_approval"], (payload.message_id,))
+        await reply_to_request(approval, approval["denyMessage"])
            
 #endregion
 
-bot.run(TOKEN)
\ No newline at end of file
+if __name__ == "__main__":
+    bot.run(TOKEN)
@@ -0,0 +1,406 @@
+# cogs/accounts.py
+import discord
+from discord.ext import commands
+from bot import (
+    Account, ACCOUNT_MONEY_FIELDS, ADMINS, LEADERBOARD_MAX, Money, QUERIES, SESSION_TTL, accountTypes,
+    authenticate, database, execute_read_query, get_account, get_channel, get_loans, hash_password,
+    loan_summary, logID, request_approval, resolve_login, run_credentials, sessions, set_balance
+)
+
+class Accounts(commands.Cog, description="Opening, viewing and editing accounts"):
+    #region Accounts
+
+    #region Create Account Command
+    @commands.command(name='createAccount', description='creates an account')
+    async def createAccount(self, message, name: str = commands.parameter(description="Name for account"), password: str = commands.parameter(description="Password for account"), type: str = commands.parameter(description="Type of account to create")):
+
+        if await database.read(get_account, name) is not None:
+            await message.reply("Account name is taken. Try again with a new name")
+            return
+
+        if type not in accountTypes:
+            await message.reply("Account must be one of the following types: " + str(accountTypes).replace("[","").replace("]","").replace(",",""))
+            return
+        
+        if type == "Checking":
+            interestRate = 0.02
+            maxWithdraw = 512
+            maxDeposit = 512
+            maxTransfer = 512
+        elif type == "Savings":
+            interestRate = 0.04
+            maxWithdraw = 256
+            maxDeposit = 256
+            maxTransfer = 256
+        elif type == "Business":
+            interestRate = 0.02
+            maxWithdraw = 1024
+            maxDeposit = 1024
+            maxTransfer = 1024
+        elif type == "Government":
+            interestRate = 0.02
+            maxWithdraw = 3072
+            maxDeposit = 3072
+            maxTransfer = 3072
+        
+        channel = await get_channel(logID)
+        logMessage = await channel.send(f'{message.author.name} would like to open a {type} account with name {name}')
+        await logMessage.add_reaction('✅')
+        await logMessage.add_reaction('❌')
+        
+        await request_approval({
+            "type": "single",
+            "query": QUERIES["create_account"],
+            "params": (name, await run_credentials(hash_password, password), type, interestRate, Money.denars(maxWithdraw), Money.denars(maxDeposit), Money.denars(maxTransfer)),
+            "id": logMessage.id,
+            "msg": message,
+            "successMessage": 'Account Created!',
+            "denyMessage": 'Account creation denied. Message bank staff for more details. Sorry for the inconvenience!'
+        })
+        
+        await message.reply(f'Awaiting Approval...')
+
+    @createAccount.error
+    async def createAccount_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+
+    #region Delete Account Command
+    @commands.command(name='deleteAccount', description='deletes an account')
+    async def deleteAccount(self, message, name: str = commands.parameter(description="Name of account"), password: str = commands.parameter(description="Password of account"), reason: str = commands.parameter(description="Why you want to delete it")):
+
+        if await authenticate(name, password) is None:
+            await message.reply("Incorrect name or password. If you believe that you have the correct name and password, contact bank staff.")
+            return
+        
+        channel = await get_channel(logID)
+        logMessage = await channel.send(f'{message.author.name} would like to delete account \'{name}\'. Their reason is \"{reason}\"')
+        await logMessage.add_reaction('✅')
+        await logMessage.add_reaction('❌')
+        
+        await request_approval({
+            "type": "single",
+            "query": QUERIES["delete_account"],
+            "params": (name,),
+            "id": logMessage.id,
+            "msg": message,
+            "successMessage": f'Account Deleted',
+            "denyMessage": 'Account deletion denied. Message bank staff for more details. Sorry for the inconvenience!'
+        })
+        
+        await message.reply(f'Awaiting Approval...')
+
+    @deleteAccount.error
+    async def deleteAccount_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+
+    #region Balance Command
+    @commands.command(name='bal', description='Finds the balance of an account')
+    async def accountBalance(self, message,name: str = commands.parameter(default=None, description="Name of account"),password: str = commands.parameter(default=None, description="Password of account")):
+        
+        arguments = await resolve_login(message, [name, password])
+        if arguments is None:
+            return
+        account, = arguments
+        name = account.name
+        
+        embedVar = discord.Embed(title=f"{name}", color=0xF5C16A)
+        embedVar.add_field(name="Balance", value=f"{str(account.money)} IMC Denars")
+        
+        loanString = loan_summary(await database.read(get_loans, name))
+
+        if loanString != "":
+            embedVar.add_field(name="Loans", value=f"{str(loanString)}", inline=False)
+
+        await message.reply(embed=embedVar)
+
+    @accountBalance.error
+    async def bal_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+
+    #region Login Command
+    @commands.command(name='login', description='Remembers your account so later commands can leave out the name and password')
+    async def loginCommand(self, message,name: str = commands.parameter(description="Name of account"),password: str = commands.parameter(description="Password of account")):
+
+        account = await authenticate(name, password)
+        if account is None:
+            await message.reply("Incorrect name or password. If you believe that you have the correct name and password, contact bank staff.")
+            return
+
+        sessions.start(message.author.id, account)
+        await message.reply(f"Logged in as {name} for {round(SESSION_TTL/60)} minutes")
+
+    @loginCommand.error
+    async def login_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+
+    @commands.command(name='logout', description='Forgets the account you logged in with')
+    async def logoutCommand(self, message):
+        if sessions.end(message.author.id):
+            await message.reply("Logged out")
+        else:
+            await message.reply("You are not logged in")
+    #endregion
+
+    #region Account Data Command
+    @commands.command(name='accountData', description='Finds the balance of an account')
+    async def accountData(self, message,name: str = commands.parameter(description="Name of account")):
+        
+        if str(message.author.id) not in ADMINS:
+            await message.reply("You lack the permissions to run that command")
+            return
+        
+        account = await database.read(get_account, name)
+        
+        if account is None:
+            await message.reply("Unable to find account")
+            return
+        
+        #region Embed
+        
+        embedVar = discord.Embed(title=f"{name}", color=0xF5C16A)
+        embedVar.add_field(name="Balance", value=f"{str(account.money)} IMC Denars", inline=True)
+        embedVar.add_field(name="Type", value=f"{account.type}", inline=True)
+        embedVar.add_field(name="Interest Rate", value=f"{str(account.interestRate*100)}%", inline=True)
+        embedVar.add_field(name="Maximum Withdraw", value=f"{str(account.maxWithdraw)} IMC Denars", inline=True)
+        embedVar.add_field(name="Maximum Deposit", value=f"{str(account.maxDeposit)} IMC Denars", inline=True)
+        embedVar.add_field(name="Maximum Transfer", value=f"{str(account.maxTransfer)} IMC Denars", inline=True)
+        embedVar.add_field(name="Amount Withdrew", value=f"{str(account.amountWithdrew)} IMC Denars", inline=True)
+        embedVar.add_field(name="Amount Deposited", value=f"{str(account.amountDeposited)} IMC Denars", inline=True)
+        embedVar.add_field(name="Amount Transferred", value=f"{str(account.amountTransferred)} IMC Denars", inline=True)
+        embedVar.add_field(name="Credit Score", value=f"{str(account.creditScore)}", inline=True)
+        
+        loanString = loan_summary(await database.read(get_loans, name))
+
+        if loanString != "":
+            embedVar.add_field(name="Loans", value=f"{str(loanString)}", inline=False)
+
+        #endregion
+
+        await message.reply(embed=embedVar)
+
+    @accountData.error
+    async def accountData_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+
+    #region Account Edit Command
+    @commands.command(name='accountEdit', description='edits account data')
+    async def accountEdit(self, message, name: str = commands.parameter(description="Name of account"), dataToChange: str = commands.parameter(description="Name of data you want to change"), newData: str = commands.parameter(description="Data to change it to")):
+        if str(message.author.id) not in ADMINS:
+            await message.reply("You lack the permissions to run that command")
+            return
+        
+        if dataToChange not in Account.__slots__:
+            await message.reply("Data must be one of the following: " + ", ".join(Account.__slots__))
+            return
+
+        if await database.read(get_account, name) is None:
+            await message.reply("Account not found")
+            return
+
+        if dataToChange in ACCOUNT_MONEY_FIELDS:
+            try:
+                newData = Money.parse(newData)
+            except ValueError:
+                await message.reply("Amount must be a number with at most two decimal places")
+                return
+        elif dataToChange == "password":
+            newData = await run_credentials(hash_password, newData)
+
+        channel = await get_channel(logID)
+        logMessage = await channel.send(f'{message.author.name} would like to edit the data of account {name}. They wish to change data of {dataToChange} to {"a new password" if dataToChange == "password" else newData}')
+        await logMessage.add_reaction('✅')
+        await logMessage.add_reaction('❌')
+            
+        if dataToChange == "money":
+            await request_approval({
+                "type": "operation",
+                "query": set_balance,
+                "args": [name, newData],
+                "id": logMessage.id,
+                "msg": message,
+                "successMessage": f'Update Completed',
+                "denyMessage": 'Update Denied.'
+            })
+        else:
+            #Column names cannot be bound as parameters, so the column is checked against Account's fields above
+            await request_approval({
+                "type": "single",
+                "query": f"UPDATE accounts SET {dataToChange} = ? WHERE name = ?",
+                "params": (newData, name),
+                "id": logMessage.id,
+                "msg": message,
+                "successMessage": f'Update Completed',
+                "denyMessage": 'Update Denied.'
+            })
+        
+        await message.reply("Awaiting Approval...")
+
+    @accountEdit.error
+    async def accountEdit_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+
+    #region Credit Score Commands
+
+    #region Creditscore Increase Command
+    @commands.command(name='creditScoreIncrease', description='Increases an accounts credit score')
+    async def creditScoreIncrease(self, message, name: str = commands.parameter(description="Name of account")):
+        if str(message.author.id) not in ADMINS:
+            await message.reply("You lack the permissions to run that command")
+            return
+        
+        account = await database.read(get_account, name)
+
+        if account is None:
+            await message.reply("Account not found")
+            return
+
+        creditScore = account.creditScore
+        
+        if creditScore+1 > 6:
+            await message.reply("Cannot increase creditscore past 6")
+            return
+        
+        increment = 32
+        if account.type == "Checking": increment = 160
+        elif account.type == "Savings": increment = 64
+        elif account.type == "Business": increment = 256
+        elif account.type == "Government": increment = 512
+        increment = Money.denars(increment)
+        
+        channel = await get_channel(logID)
+        logMessage = await channel.send(f'{message.author.name} would like to increase the credit score of account {name}. Their new credit score will be {str(creditScore+1)}')
+        await logMessage.add_reaction('✅')
+        await logMessage.add_reaction('❌')
+        
+        await request_approval({
+            "type": "single",
+            "query": QUERIES["change_credit_score"],
+            "params": (1, increment, increment, increment, name),
+            "id": logMessage.id,
+            "msg": message,
+            "successMessage": f'Update Completed',
+            "denyMessage": 'Update Denied.'
+        })
+        
+        await message.reply("Awaiting Approval...")
+
+    @creditScoreIncrease.error
+    async def creditScoreIncrease_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+
+    #region Creditscore Decrease Command
+    @commands.command(name='creditScoreDecrease', description='Decreases an accounts credit score')
+    async def creditScoreDecrease(self, message, name: str = commands.parameter(description="Name of account")):
+        if str(message.author.id) not in ADMINS:
+            await message.reply("You lack the permissions to run that command")
+            return
+        
+        account = await database.read(get_account, name)
+
+        if account is None:
+            await message.reply("Account not found")
+            return
+
+        creditScore = account.creditScore
+        
+        if creditScore-1 < 0:
+            await message.reply("Cannot decrease creditscore below 0")
+            return
+        
+        increment = 32
+        if account.type == "Checking": increment = 160
+        elif account.type == "Savings": increment = 64
+        elif account.type == "Business": increment = 256
+        elif account.type == "Government": increment = 512
+        increment = Money.denars(increment)
+        
+        channel = await get_channel(logID)
+        logMessage = await channel.send(f'{message.author.name} would like to decrease the credit score of account {name}. Their new credit score will be {str(creditScore-1)}')
+        await logMessage.add_reaction('✅')
+        await logMessage.add_reaction('❌')
+        
+        await request_approval({
+            "type": "single",
+            "query": QUERIES["change_credit_score"],
+            "params": (-1, -increment, -increment, -increment, name),
+            "id": logMessage.id,
+            "msg": message,
+            "successMessage": f'Update Completed',
+            "denyMessage": 'Update Denied.'
+        })
+        
+        await message.reply("Awaiting Approval...")
+
+    @creditScoreDecrease.error
+    async def creditScoreDecrease_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+
+    #endregion
+
+    @commands.command(name='treasury', description='Shows the money held by the bank, by account type')
+    async def treasuryCommand(self, message):
+        if str(message.author.id) not in ADMINS:
+            await message.reply("You lack the permissions to run that command")
+            return
+
+        treasury = await database.read(execute_read_query, QUERIES["get_treasury"])
+        imcAccount = await database.read(get_account, 'IMC')
+        lotteryAccount = await database.read(get_account, 'Lottery')
+
+        customerAccounts = sum(accounts for type, accounts, money in treasury if type != 'Official')
+        customerMoney = Money(sum(money for type, accounts, money in treasury if type != 'Official'))
+
+        embedVar = discord.Embed(title="Treasury", color=0xF5C16A)
+        embedVar.add_field(name="Customer Deposits", value=f"{customerMoney} IMC Denars in {customerAccounts} accounts", inline=False)
+        embedVar.add_field(name="IMC", value=f"{imcAccount.money if imcAccount else 0} IMC Denars", inline=True)
+        embedVar.add_field(name="Lottery", value=f"{lotteryAccount.money if lotteryAccount else 0} IMC Denars", inline=True)
+
+        byType = ""
+        for type, accounts, money in treasury:
+            byType += f"{type}: {Money(money)} IMC Denars in {accounts} accounts\n"
+
+        if byType != "":
+            embedVar.add_field(name="By Account Type", value=byType, inline=False)
+
+        await message.reply(embed=embedVar)
+
+    @commands.command(name='leaderboard', description='Shows the customer accounts holding the most money')
+    async def leaderboardCommand(self, message, count: int = commands.parameter(default=10, description="Number of accounts to show")):
+        #Account names are half of each login, so they are only shown to staff
+        if str(message.author.id) not in ADMINS:
+            await message.reply("You lack the permissions to run that command")
+            return
+        
+        leaders = await database.read(execute_read_query, QUERIES["get_leaderboard"], (min(max(count, 1), LEADERBOARD_MAX),))
+        
+        leaderString = ""
+        for place, (name, money) in enumerate(leaders, start=1):
+            leaderString += f"{place}. {name}: {Money(money)} IMC Denars\n"
+
+        embedVar = discord.Embed(title="Leaderboard", description=leaderString or "No accounts yet", color=0xF5C16A)
+        await message.reply(embed=embedVar)
+
+    @leaderboardCommand.error
+    async def leaderboard_error(self, ctx, error):
+        if isinstance(error, commands.BadArgument):
+            await ctx.send("Count must be an integer")
+
+    #endregion
+
+async def setup(bot):
+    await bot.add_cog(Accounts())
@@ -0,0 +1,39 @@
+# cogs/feedback.py
+from discord.ext import commands
+from bot import complaintID, get_channel, suggestionID
+
+class Feedback(commands.Cog, description="Suggestions and complaints for bank staff"):
+    #region Suggestion Command
+    @commands.command(name='suggest', description='Submit a suggestion. WARNING: use quotation marks if it includes more than one word!')
+    async def suggestCommand(self, message, suggestion: str = commands.parameter(description="The suggestion you wish to submit")):
+        channel = await get_channel(suggestionID)
+        suggestMessage = await channel.send(suggestion)
+        await suggestMessage.add_reaction('✅')
+        await suggestMessage.add_reaction('❌')
+        
+        await message.reply("Suggestion complete")
+
+    @suggestCommand.error
+    async def suggestCommand_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+
+    #region Complaint Command
+    @commands.command(name='complain', description='Submit a complaint. WARNING: use quotation marks if it includes more than one word!')
+    async def complainCommand(self, message, complaint: str = commands.parameter(description="The complaint you wish to submit")):
+        channel = await get_channel(complaintID)
+        complainMessage = await channel.send(complaint)
+        await complainMessage.add_reaction('✅')
+        await complainMessage.add_reaction('❌')
+        
+        await message.reply("Suggestion complete")
+
+    @complainCommand.error
+    async def complainCommand_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+
+async def setup(bot):
+    await bot.add_cog(Feedback())
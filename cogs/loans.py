@@ -0,0 +1,376 @@
+# cogs/loans.py
+import math
+from discord.ext import commands
+from bot import (
+    ADMINS, Loan, LOAN_MONEY_FIELDS, MAX_DENARS, Money, QUERIES, auditLog, database, execute_operation,
+    execute_read_query, get_account, get_channel, get_loan, grant_loan, logID, pay_loan,
+    request_approval, resolve_login, send_loan_notices
+)
+
+class Loans(commands.Cog, description="Applying for, paying and managing loans"):
+    #region Loans
+
+    #region Loan Apply
+    @commands.command(name='loanApply', description='Apply for a loan')
+    async def loanApply(self, message, 
+                        name: str = commands.parameter(default=None, description="Name of account"), 
+                        password: str = commands.parameter(default=None, description="Password of account"), 
+                        amount: str = commands.parameter(default=None, description="Amount you would like to take out a loan for"), 
+                        reason: str = commands.parameter(default=None, description="Why you need the loan")):
+        
+        arguments = await resolve_login(message, [name, password, amount, reason])
+        if arguments is None:
+            return
+        account, amount, reason = arguments
+        name = account.name
+        
+        try:
+            amount = int(amount)
+            if amount <= 0 or amount > MAX_DENARS:
+                await message.reply("Amount must be a positive integer")
+                return
+        except:
+            await message.reply("Amount must be a positive integer")
+            return
+        
+        creditScore = account.creditScore
+        
+        payPercent = 0;
+        lateFee = 0;
+        interestRate = 0;
+        if creditScore == 0:
+            interestRate = 0.2
+            payPercent = 0.15
+            lateFee = math.floor(amount*0.2)
+        elif creditScore == 1:
+            interestRate = 0.15
+            payPercent = 0.11
+            lateFee = math.floor(amount*0.15)
+        elif creditScore == 2:
+            interestRate = 0.125
+            payPercent = 0.09
+            lateFee = math.floor(amount*0.125)
+        elif creditScore == 3:
+            interestRate = 0.1
+            payPercent = 0.075
+            lateFee = math.floor(amount*0.1)
+        elif creditScore == 4:
+            interestRate = 0.08
+            payPercent = 0.06
+            lateFee = math.floor(amount*0.08)
+        elif creditScore == 5:
+            interestRate = 0.07
+            payPercent = 0.05
+            lateFee = math.floor(amount*0.07)
+        elif creditScore == 6:
+            interestRate = 0.05
+            payPercent = 0.05
+            lateFee = math.floor(amount*0.05)
+        
+        amount, lateFee = Money.denars(amount), Money.denars(lateFee)
+            
+        channel = await get_channel(logID)
+        logMessage = await channel.send(f'{message.author.name} would like to get a loan on an account with name {name} for {str(amount)} IMC Denars. They have a credit score of {str(creditScore)}. They want this loan because {reason}')
+        await logMessage.add_reaction('✅')
+        await logMessage.add_reaction('❌')
+        
+        await request_approval({
+            "type": "operation",
+            "query": grant_loan,
+            "args": [name, interestRate, amount, message.author.id, payPercent, lateFee],
+            "id": logMessage.id,
+            "msg": message,
+            "successMessage": 'Loan Approved!',
+            "denyMessage": 'Loan denied. Message bank staff for more details. Sorry for the inconvenience!'
+        })
+        
+        await message.reply("Awaiting Approval...")
+
+    @loanApply.error
+    async def loanApply_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+
+    #region Loan Negotiate
+    @commands.command(name='loanNegotiate', description='Apply for a loan where you negotiate the terms')
+    async def loanNegotiate(self, message, 
+                        name: str = commands.parameter(default=None, description="Name of account"), 
+                        password: str = commands.parameter(default=None, description="Password of account"), 
+                        amount: str = commands.parameter(default=None, description="Amount you would like to take out a loan for"), 
+                        interestRate: str = commands.parameter(default=None, description="Starting offer interest rate"), 
+                        payPercent: str = commands.parameter(default=None, description="Starting offer minimum monthly payment"), 
+                        lateFee: str = commands.parameter(default=None, description="Starting offer late fee"), 
+                        reason: str = commands.parameter(default=None, description="Why you need a loan")):
+        
+        arguments = await resolve_login(message, [name, password, amount, interestRate, payPercent, lateFee, reason])
+        if arguments is None:
+            return
+        account, amount, interestRate, payPercent, lateFee, reason = arguments
+        name = account.name
+        
+        try:
+            amount = int(amount)
+            if amount <= 0 or amount > MAX_DENARS:
+                await message.reply("Amount must be a positive integer")
+                return
+        except:
+            await message.reply("Amount must be a positive integer")
+            return
+        
+        try:
+            interestRate = float(interestRate)
+            if interestRate <= 0:
+                await message.reply("Interest Rate must be a positive decimal value")
+                return
+        except:
+            await message.reply("Interest Rate must be a positive decimal value")
+            return
+        
+        try:
+            payPercent = float(payPercent)
+            if payPercent <= 0:
+                await message.reply("Pay Percent must be a positive decimal value")
+                return
+        except:
+            await message.reply("Pay Percent must be a positive decimal value")
+            return
+        
+        try:
+            lateFee = int(lateFee)
+            if lateFee <= 0 or lateFee > MAX_DENARS:
+                await message.reply("Late Fee must be a positive integer")
+                return
+        except:
+            await message.reply("Late Fee must be a positive integer")
+            return
+        
+        creditScore = account.creditScore
+            
+        amount, lateFee = Money.denars(amount), Money.denars(lateFee)
+        
+        channel = await get_channel(logID)
+        logMessage = await channel.send(f'{message.author.name} would like to **negotiate** a loan on an account with name {name} for {str(amount)} IMC Denars. They have a credit score of {str(creditScore)}. They want an interest rate of {str(interestRate)}, a monthly pay percent of {str(payPercent)}, and a late fee of {str(lateFee)}. The reason they want the loan is \'{reason}\'')
+        await logMessage.add_reaction('✅')
+        await logMessage.add_reaction('❌')
+        
+        await request_approval({
+            "type": "operation",
+            "query": grant_loan,
+            "args": [name, interestRate, amount, message.author.id, payPercent, lateFee],
+            "id": logMessage.id,
+            "msg": message,
+            "successMessage": 'Loan Approved!',
+            "denyMessage": 'Loan denied. Message bank staff for more details. Sorry for the inconvenience!'
+        })
+        
+        await message.reply("Finding Bank Staff. Someone will message you to negotiate shortly")
+
+    @loanNegotiate.error
+    async def loanNegotiate_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+
+    #region Loan Delete
+    @commands.command(name='loanDelete', description='Delete a loan')
+    async def loanDelete(self, message, 
+                            id: str = commands.parameter(description="ID of loan"), 
+                            reason: str = commands.parameter(description="Reason for deleting loan")):
+        
+        if str(message.author.id) not in ADMINS:
+            await message.reply("You lack the permissions to run that command")
+            return
+        
+        if await database.read(get_loan, id) is None:
+            await message.reply("Unable to find loan.")
+            return
+        
+        channel = await get_channel(logID)
+        logMessage = await channel.send(f'{message.author.name} would like to delete loan ID {id}. Their reason is \"{reason}\"')
+        await logMessage.add_reaction('✅')
+        await logMessage.add_reaction('❌')
+        
+        await request_approval({
+            "type": "single",
+            "query": QUERIES["delete_loan"],
+            "params": (id,),
+            "id": logMessage.id,
+            "msg": message,
+            "successMessage": f'Loan Deleted',
+            "denyMessage": 'Loan deletion denied. Message bank staff for more details. Sorry for the inconvenience!'
+        })
+        
+        await message.reply(f'Awaiting Approval...')
+
+    @loanDelete.error
+    async def loanDelete_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+
+    #region Loan Pay
+    @commands.command(name='payLoan', description='Pays back part of your loan')
+    async def payLoan(self, message,
+                        name: str = commands.parameter(default=None, description="Name of account"),
+                        password: str = commands.parameter(default=None, description="Password of account"),
+                        id: str = commands.parameter(default=None, description="ID of loan you wish to pay"),
+                        amount: str = commands.parameter(default=None, description="Amount you would like to pay back")):
+        
+        arguments = await resolve_login(message, [name, password, id, amount])
+        if arguments is None:
+            return
+        account, id, amount = arguments
+        name = account.name
+        
+        try: int(id)
+        except: 
+            await message.reply("ID must be an integer")
+            return
+        
+        try: 
+            amount = Money.parse(amount)
+            if amount <= 0:
+                await message.reply("Amount must be a positive number")
+                return
+        except ValueError: 
+            await message.reply("Amount must be a number with at most two decimal places")
+            return
+        
+        loan = await database.read(get_loan, id, name)
+
+        if loan is None:
+            await message.reply("Unable to find loan or loan is not on this account")
+            return
+
+        amountRemaining = loan.amountRemaining
+
+        if amount > amountRemaining:
+            await message.reply("You cannot pay back more money than is remaining on the loan")
+            return
+
+        if (amount < amountRemaining*loan.payPercent) and (amountRemaining-amount >= amountRemaining*loan.payPercent):
+            await message.reply("You cannot pay less than your minimum pay percent")
+            return
+
+        if not await database.run(execute_operation, pay_loan, name, int(id), amount):
+            account = await database.read(get_account, name)
+            if account is not None and account.money < amount:
+                await message.reply("You lack the funds for that transaction")
+            else:
+                await message.reply("Loan payment failed because the loan changed while paying it. Check your balance and try again.")
+            return
+        
+        auditLog.log(f'{message.author.name} has paid back part of loan ID: {id}. It has {str(Money(amountRemaining-amount))} IMC Denars remaining.')
+        
+        await message.reply("Loan Payment Completed")
+        
+        if amountRemaining-amount < Money.denars(1):
+            await message.reply("Loan fully paid!")
+
+    @payLoan.error
+    async def payLoan_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+
+    #region Loan Edit Command
+    @commands.command(name='loanEdit', description='Edits loan data')
+    async def loanEdit(self, message, 
+                          id: str = commands.parameter(description="ID of loan"), 
+                          dataToChange: str = commands.parameter(description="Name of data you want to change"), 
+                          newData: str = commands.parameter(description="Data to change it to")):
+        
+        if str(message.author.id) not in ADMINS:
+            await message.reply("You lack the permissions to run that command")
+            return
+        
+        if dataToChange not in Loan.__slots__ or dataToChange == "id":
+            await message.reply("Data must be one of the following: " + ", ".join(Loan.__slots__[1:]))
+            return
+
+        if await database.read(get_loan, id) is None:
+            await message.reply("Loan not found")
+            return
+        
+        if dataToChange in LOAN_MONEY_FIELDS:
+            try:
+                newData = Money.parse(newData)
+            except ValueError:
+                await message.reply("Amount must be a number with at most two decimal places")
+                return
+
+        #Column names cannot be bound as parameters, so the column is checked against Loan's fields above
+        update_query = f"UPDATE loans SET {dataToChange} = ? WHERE id = ?"
+        
+        channel = await get_channel(logID)
+        logMessage = await channel.send(f'{message.author.name} would like to edit the data of loan ID: {id}. They wish to change data of {dataToChange} to {newData}')
+        await logMessage.add_reaction('✅')
+        await logMessage.add_reaction('❌')
+            
+        await request_approval({
+            "type": "single",
+            "query": update_query,
+            "params": (newData, id),
+            "id": logMessage.id,
+            "msg": message,
+            "successMessage": f'Update Completed',
+            "denyMessage": 'Update Denied.'
+        })
+        
+        await message.reply("Awaiting Approval...")
+
+    @loanEdit.error
+    async def loanEdit_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+
+    @commands.command(name='biWeeklyUpdate', description='Update loans and account holdings with interest')
+    async def biWeeklyUpdate(self, message):
+        
+        if str(message.author.id) not in ADMINS:
+            await message.reply("You lack the permissions to run that command")
+            return
+        
+        channel = await get_channel(logID)
+        
+        delivered, failed = await send_loan_notices()
+        
+        loanCount, unpaidCount, loanInterest, lateFees = (await database.read(execute_read_query, QUERIES["preview_loan_interest"]))[0]
+        
+        logMessage = await channel.send(f'{message.author.name} would like to update loan interests: {loanCount} loans will accrue {Money(loanInterest)} IMC Denars of interest, plus {Money(lateFees)} IMC Denars of late fees on {unpaidCount} unpaid loans')
+        await logMessage.add_reaction('✅')
+        await logMessage.add_reaction('❌')
+        
+        await request_approval({
+            "type": "single",
+            "query": QUERIES["apply_loan_interest"],
+            "params": (),
+            "id": logMessage.id,
+            "msg": message,
+            "successMessage": f'Update Completed',
+            "denyMessage": 'Update Denied'
+        })
+        
+        accountCount, accountInterest = (await database.read(execute_read_query, QUERIES["preview_account_interest"]))[0]
+        
+        logMessage = await channel.send(f'{message.author.name} would like to update account holdings for interest: {accountCount} accounts will earn {Money(accountInterest)} IMC Denars of interest')
+        await logMessage.add_reaction('✅')
+        await logMessage.add_reaction('❌')
+        
+        await request_approval({
+            "type": "many",
+            "query": [(QUERIES["record_account_interest"], ()), (QUERIES["apply_account_interest"], ())],
+            "id": logMessage.id,
+            "msg": message,
+            "successMessage": f'Update Completed',
+            "denyMessage": 'Update Denied'
+        })
+        
+        await message.reply(f'Pending... Loan notices delivered to {delivered} borrowers, {failed} failed')
+
+    #endregion
+
+async def setup(bot):
+    await bot.add_cog(Loans())
@@ -0,0 +1,166 @@
+# cogs/lottery.py
+from discord.ext import commands
+from bot import (
+    ADMINS, LOTTERY_WINNER_MESSAGE, MAX_TICKETS, QUERIES, buy_lottery_ticket, database, execute_operation,
+    execute_read_query, get_account, get_channel, logID, pay_lottery_winner, request_approval, resolve_login
+)
+
+class Lottery(commands.Cog, description="Lottery tickets and draws"):
+    #region Lottery
+
+    #region Buy Lottery Ticket Command
+    @commands.command(name='buyLotteryTicket', description='buy lottery tickets')
+    async def buyLotteryTicket(self, message, name: str = commands.parameter(default=None, description="Name of account"), password: str = commands.parameter(default=None, description="Password of account"), count: str = commands.parameter(default=None, description="Number of tickets to buy")):
+        
+        arguments = await resolve_login(message, [name, password, count], optional=1)
+        if arguments is None:
+            return
+        account, count = arguments
+        name = account.name
+        
+        try:
+            count = 1 if count is None else int(count)
+        except ValueError:
+            await message.reply("Ticket count must be an integer")
+            return
+        
+        if count < 1:
+            await message.reply("You must buy at least one ticket")
+            return
+
+        if count > MAX_TICKETS:
+            await message.reply(f"You can buy at most {MAX_TICKETS} tickets at once")
+            return
+        
+        if not await database.run(execute_operation, buy_lottery_ticket, name, count):
+            if await database.read(get_account, name) is None:
+                await message.reply("Incorrect username or password.")
+            else:
+                await message.reply("You lack the funds for that transaction")
+            return
+
+        if count == 1:
+            await message.reply("Ticket Purchased")
+        else:
+            await message.reply(f"{count} Tickets Purchased")
+
+    @buyLotteryTicket.error
+    async def buyLotteryTicket_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+
+    #region End Lottery Command
+    @commands.command(name='endLottery', description='Rolls for a lottery winner and deposits the money')
+    async def endLottery(self, message):
+        
+        if str(message.author.id) not in ADMINS:
+            await message.reply("You lack the permissions to run that command")
+            return
+        
+        #The winner itself is only drawn once this is approved
+        if (await database.read(execute_read_query, QUERIES["count_lottery_tickets"]))[0][0] == 0:
+            await message.reply("No tickets have been bought for this lottery")
+            return
+        
+        channel = await get_channel(logID)
+        logMessage = await channel.send(f'{message.author.name} would like to end the lottery and roll a winner')
+        await logMessage.add_reaction('✅')
+        await logMessage.add_reaction('❌')
+        
+        await request_approval({
+            "type": "operation",
+            "query": pay_lottery_winner,
+            "args": [],
+            "id": logMessage.id,
+            "msg": message,
+            "successMessage": LOTTERY_WINNER_MESSAGE,
+            "denyMessage": 'Lottery roll denied'
+        })
+        
+        await message.reply("Awaiting Approval...")
+
+    @endLottery.error
+    async def endLottery_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+
+    #endregion
+
+    #region Gambling
+
+    '''
+    #region Dice Roll Command
+    @commands.command(name='dice', description='gamble on a dice roll')
+    async def diceRoll(self, message, name: str = commands.parameter(description="Name of account"), password: str = commands.parameter(description="Password of account"), guess: str = commands.parameter(description="Which number you would like to bet on"), betAmount: str = commands.parameter(description="How much you would like to bet")):
+        
+        try:
+            guess = int(guess)
+
+        except:
+            await message.reply("Guess must be an integer")
+            return
+            
+        try:
+            betAmount = int(betAmount)
+            if betAmount <= 0:
+                await message.reply("Bet amount must be a positive integer")
+                return
+        except:
+            await message.reply("Bet amount must be a positive integer")
+            return
+        
+        if guess not in range(1,7):
+            await message.reply("Guess must be a number in the range [1,6]")
+            return
+        
+        checkLogin = f"""
+        SELECT *
+        FROM accounts 
+        WHERE name = '{name}'"""
+        
+        check = execute_read_query(connection, checkLogin)
+        if check == []: 
+            await message.reply("Account not found")
+            return
+        
+        money = execute_read_query(connection, f"SELECT money FROM accounts WHERE name = '{name}' AND password = '{password}'")
+        money = float(str(money).replace("[(","").replace(",)]",""))
+        
+        if money < betAmount:
+            await message.reply("You lack the funds for that transaction.")
+            return
+        
+        roll = random.randint(1,6)
+        
+        channel = await get_channel(logID)
+        
+        if roll == guess:
+            money += betAmount*2
+            await message.reply(f"The dice rolled {str(roll)}. You win! Your money got tripled! You now have {str(money)} IMC Denars")
+            await channel.send(f"{message.author.name} won {str(betAmount)} on a dice roll! They now have {str(money)} IMC Denars")
+        else:
+            money -= betAmount
+            await message.reply(f"The dice rolled {str(roll)}. You lost {str(betAmount)} IMC Denars...")
+            await channel.send(f"{message.author.name} lost {str(betAmount)} on a dice roll! They now have {str(money)} IMC Denars")
+            
+        gamble_query = f"""
+        UPDATE accounts
+        SET money = {str(money)}
+        WHERE name = '{name}' AND password = '{password}'
+        """
+        
+        execute_query(connection, gamble_query)
+
+    @diceRoll.error
+    async def diceRoll_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+    '''
+
+    #endregion
+
+async def setup(bot):
+    await bot.add_cog(Lottery())
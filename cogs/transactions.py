@@ -0,0 +1,252 @@
+# cogs/transactions.py
+import discord
+from discord.ext import commands
+from bot import (
+    ADMINS, HISTORY_PAGE_SIZE, Money, QUERIES, auditLog, database, deposit, execute_operation,
+    get_account, get_channel, get_transactions, logID, prefix, request_approval, resolve_login,
+    transfer, withdraw
+)
+
+class Transactions(commands.Cog, description="Moving money in, out and between accounts"):
+    #region Transactions
+
+    #region Deposit Command
+    @commands.command(name='deposit', description="Deposit money into your account")
+    async def depositCommand(self, message, name: str = commands.parameter(default=None, description="Name of account"), password: str = commands.parameter(default=None, description="Password of account"), amount: str = commands.parameter(default=None, description="Amount to deposit"), atmID: str = commands.parameter(default=None, description="ID of where you are depositing it")):
+        
+        arguments = await resolve_login(message, [name, password, amount, atmID])
+        if arguments is None:
+            return
+        account, amount, atmID = arguments
+        name = account.name
+        
+        try:
+            amount = Money.parse(amount)
+            if amount <= 0:
+                await message.reply("Amount must be a positive number")
+                return
+        except ValueError:
+            await message.reply("Amount must be a number with at most two decimal places")
+            return
+            
+        channel = await get_channel(logID)
+
+        if await database.run(execute_operation, deposit, name, amount, True):
+            auditLog.log(f'{message.author.name} deposited {amount} IMC Denars into account \'{name}\' into ATM with ID {atmID}.')
+            await message.reply("Deposit Completed")
+        else:
+            if await database.read(get_account, name) is None:
+                await message.reply("Incorrect name or password. If you believe that you have the correct name and password, contact bank staff.")
+                return
+
+            logMessage = await channel.send(f'{message.author.name} would like to deposit {amount} IMC Denars into account \'{name}\' into ATM with ID {atmID}.')
+            await logMessage.add_reaction('✅')
+            await logMessage.add_reaction('❌')
+            
+            await request_approval({
+                "type": "operation",
+                "query": deposit,
+                "args": [name, amount, False],
+                "id": logMessage.id,
+                "msg": message,
+                "successMessage": f'Deposit Completed',
+                "denyMessage": 'Deposit denied. Message bank staff for more details. Sorry for the inconvenience!'
+            })
+            
+            await message.reply("Awaiting approval because you have surpassed your account's daily limit...")
+
+    @depositCommand.error
+    async def deposit_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+
+    #region Withdraw Command
+    @commands.command(name='withdraw', description="Withdraw money from your account")
+    async def withdrawCommand(self, message, name: str = commands.parameter(default=None, description="Name of account"), password: str = commands.parameter(default=None, description="Password of account"), amount: str = commands.parameter(default=None, description="Amount to withdraw"), atmID: str = commands.parameter(default=None, description="ID of where you are depositing it")):
+        
+        arguments = await resolve_login(message, [name, password, amount, atmID])
+        if arguments is None:
+            return
+        account, amount, atmID = arguments
+        name = account.name
+        
+        try:
+            amount = Money.parse(amount)
+            if amount <= 0:
+                await message.reply("Amount must be a positive number")
+                return
+        except ValueError:
+            await message.reply("Amount must be a number with at most two decimal places")
+            return
+            
+        channel = await get_channel(logID)
+
+        if await database.run(execute_operation, withdraw, name, amount, True):
+            auditLog.log(f'{message.author.name} withdrew {amount} IMC Denars from account \'{name}\' from ATM with ID {atmID}.')
+            await message.reply("Withdraw Completed")
+        else:
+            account = await database.read(get_account, name)
+            if account is None:
+                await message.reply("Incorrect name or password. If you believe that you have the correct name and password, contact bank staff.")
+                return
+
+            if account.money < amount:
+                await message.reply("You lack the funds to withdraw that amount. You may want to look into taking a loan.")
+                return
+
+            logMessage = await channel.send(f'{message.author.name} would like to withdraw {amount} IMC Denars from account \'{name}\' from ATM with ID {atmID}.')
+            await logMessage.add_reaction('✅')
+            await logMessage.add_reaction('❌')
+            
+            await request_approval({
+                "type": "operation",
+                "query": withdraw,
+                "args": [name, amount, False],
+                "id": logMessage.id,
+                "msg": message,
+                "successMessage": f'Withdraw Completed',
+                "denyMessage": 'Withdraw denied. Message bank staff for more details. The most likely reason is that you withdrew past your max withdraw amount. Sometimes we will allow this, but that is the exception not the rule. Sorry for the inconvenience!'
+            })
+            
+            await message.reply("Awaiting approval because you have surpassed your account's daily limit...")
+
+    @withdrawCommand.error
+    async def withdraw_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+
+    #region Transfer Command
+    @commands.command(name='transfer', description='Transfer money between accounts')
+    async def transferCommand(self, message, name: str = commands.parameter(default=None, description="Name of account"), password: str = commands.parameter(default=None, description="Password of account"), recipientName: str = commands.parameter(default=None, description="Name of recipient account"), amount: str = commands.parameter(default=None, description="Amount to transfer")):
+        
+        arguments = await resolve_login(message, [name, password, recipientName, amount])
+        if arguments is None:
+            return
+        account, recipientName, amount = arguments
+        name = account.name
+        
+        try:
+            amount = Money.parse(amount)
+            if amount <= 0:
+                await message.reply("Amount must be a positive number")
+                return
+        except ValueError:
+            await message.reply("Amount must be a number with at most two decimal places")
+            return
+            
+        channel = await get_channel(logID)
+
+        if await database.run(execute_operation, transfer, name, recipientName, amount, True):
+            auditLog.log(f'{message.author.name} transferred {amount} from account \'{name}\' to account \'{recipientName}\'')
+            await message.reply("Transfer Completed")
+        else:
+            sender = await database.read(get_account, name)
+
+            if sender is None:
+                await message.reply("Incorrect name or password. If you believe that you have the correct name and password, contact bank staff.")
+                return
+
+            if await database.read(get_account, recipientName) is None:
+                await message.reply("Unable to find recipient. If you believe that you have the correct account name, contact bank staff.")
+                return
+
+            if sender.money < amount:
+                await message.reply("You lack the funds to transfer that amount. You may want to look into taking a loan.")
+                return
+
+            logMessage = await channel.send(f'{message.author.name} would like to transfer {amount} IMC Denars from account \'{name}\' to account \'{recipientName}\'')
+            await logMessage.add_reaction('✅')
+            await logMessage.add_reaction('❌')
+            
+            await request_approval({
+                "type": "operation",
+                "query": transfer,
+                "args": [name, recipientName, amount, False],
+                "id": logMessage.id,
+                "msg": message,
+                "successMessage": f'Transfer Completed',
+                "denyMessage": 'Transfer denied. Message bank staff for more details. The most likely reason is that you transferred past your max transfer amount. Sometimes we will allow this, but that is the exception not the rule. Sorry for the inconvenience!'
+            })
+            
+            await message.reply("Awaiting approval because you have surpassed your account's daily limit...")
+
+    @transferCommand.error
+    async def transfer_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+
+    @commands.command(name='resetDailyMax', description='Resets the withdrew and deposited amount')
+    async def resetDailyMaxCommand(self, message):
+        if str(message.author.id) not in ADMINS:
+            await message.reply("You lack the permissions to run that command")
+            return
+        
+        channel = await get_channel(logID)
+        logMessage = await channel.send(f'{message.author.name} would like to reset withdrew and deposited amounts')
+        await logMessage.add_reaction('✅')
+        await logMessage.add_reaction('❌')
+            
+        await request_approval({
+            "type": "single",
+            "query": QUERIES["reset_daily_maximums"],
+            "params": (),
+            "id": logMessage.id,
+            "msg": message,
+            "successMessage": f'Amounts Reset',
+            "denyMessage": 'Someone declined the request.'
+        })
+        
+        await message.reply("Pending...")
+
+    #region History Command
+
+    @commands.command(name='history', description='Lists the transactions of an account, newest first')
+    async def accountHistory(self, message,name: str = commands.parameter(default=None, description="Name of account"),password: str = commands.parameter(default=None, description="Password of account"),before: str = commands.parameter(default=None, description="ID of the last transaction already seen, to show older ones")):
+        
+        arguments = await resolve_login(message, [name, password, before], optional=1)
+        if arguments is None:
+            return
+        account, before = arguments
+        name = account.name
+        
+        if before is not None:
+            try:
+                before = int(before)
+                if not 0 < before < 2**63:
+                    raise ValueError(before)
+            except ValueError:
+                await message.reply("ID must be an integer")
+                return
+        
+        transactions = await database.read(get_transactions, name, HISTORY_PAGE_SIZE+1, before)
+        
+        if transactions == []:
+            await message.reply("No transactions found")
+            return
+        
+        historyString = ""
+        for entry in transactions[:HISTORY_PAGE_SIZE]:
+            historyString += f"`#{entry.id}` <t:{entry.timestamp}:f> {entry.type}: {'+' if entry.amount > 0 else ''}{entry.amount} IMC Denars"
+            if entry.counterparty is not None:
+                historyString += f" ({entry.counterparty})"
+            historyString += "\n"
+        
+        embedVar = discord.Embed(title=f"{name} History", description=historyString, color=0xF5C16A)
+        if len(transactions) > HISTORY_PAGE_SIZE:
+            embedVar.set_footer(text=f"Run {prefix}history {name} <password> {transactions[HISTORY_PAGE_SIZE-1].id} for older transactions")
+        
+        await message.reply(embed=embedVar)
+
+    @accountHistory.error
+    async def history_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("All arguments not provided, try running the help command")
+    #endregion
+
+    #endregion
+
+async def setup(bot):
+    await bot.add_cog(Transactions())
@@ -0,0 +1,379 @@
+# loadtest.py
+# Drives the real command pipeline with simulated users through a fake Discord gateway and HTTP API, then checks the books still balance
+#   python loadtest.py --users 2000 --commands 20 --output load.json
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import random
+import re
+import shutil
+import statistics
+import sys
+import time
+from collections import defaultdict
+from itertools import count
+
+import discord
+
+import testbed
+
+#region Setup
+
+parser = argparse.ArgumentParser(description="Simulates concurrent Discord users against the bot's command pipeline")
+parser.add_argument("--users", type=int, default=1000, help="Number of simulated users, each with their own account")
+parser.add_argument("--commands", type=int, default=20, help="Commands each user sends after logging in")
+parser.add_argument("--think", type=float, default=0.0, help="Maximum random pause in seconds between a user's commands")
+parser.add_argument("--deny", type=float, default=0.1, help="Fraction of approvals the simulated admin denies")
+parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for a reply before counting a command as lost")
+parser.add_argument("--scrypt-n", type=int, default=2**10, help="Password hash work factor, kept low so thousands of logins finish quickly")
+parser.add_argument("--seed", type=int, default=0, help="Random seed")
+parser.add_argument("--output", default=None, help="Write the JSON report here instead of stdout")
+arguments = parser.parse_args()
+
+ADMIN_ID = 1
+BOT_ID = 2
+LOG_CHANNEL_ID = 10
+SUGGESTION_CHANNEL_ID = 11
+COMPLAINT_CHANNEL_ID = 12
+GUILD_ID = 20
+PASSWORD = "loadtest"
+
+bot, directory = testbed.import_bot("imc-loadtest-", PASSWORD, {
+    "ADMINS": str(ADMIN_ID),
+    "LOG_CHANNEL_ID": str(LOG_CHANNEL_ID),
+    "SUGGESTION_CHANNEL_ID": str(SUGGESTION_CHANNEL_ID),
+    "COMPLAINT_CHANNEL_ID": str(COMPLAINT_CHANNEL_ID),
+    "SCRYPT_N": str(arguments.scrypt_n),
+})
+
+Money = bot.Money
+
+#endregion
+
+#region Fake Discord
+
+snowflakes = count(1000)
+
+def timestamp():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+def user_payload(id):
+    return {"id": str(id), "username": f"user{id}", "discriminator": "0", "avatar": None, "global_name": None}
+
+def message_payload(id, channelID, authorID, content, embeds=()):
+    return {
+        "id": str(id),
+        "channel_id": str(channelID),
+        "author": user_payload(authorID),
+        "content": content,
+        "embeds": list(embeds),
+        "attachments": [],
+        "mentions": [],
+        "mention_roles": [],
+        "type": 0,
+        "timestamp": timestamp(),
+        "edited_timestamp": None,
+        "tts": False,
+        "pinned": False,
+        "mention_everyone": False,
+    }
+
+#Stands in for discord.py's HTTPClient. Sent messages are recorded, and replies are routed to whoever is waiting on the message they reply to
+class FakeHTTP:
+    def __init__(self):
+        self.loop = None
+        self.replies = defaultdict(asyncio.Queue)
+        self.requests = 0
+
+    #Every endpoint goes through request() with its route, as in discord.py's HTTPClient, so the bot's API call counting sees these calls too
+    async def request(self, route, *, respond):
+        self.requests += 1
+        return respond()
+
+    async def send_message(self, channel_id, *, params):
+        return await self.request(discord.http.Route("POST", "/channels/{channel_id}/messages", channel_id=channel_id), respond=lambda: self.deliver(channel_id, params.payload))
+
+    def deliver(self, channel_id, payload):
+        embeds = payload.get("embeds") or []
+        data = message_payload(next(snowflakes), channel_id, BOT_ID, payload.get("content") or "", embeds)
+
+        reference = payload.get("message_reference")
+        if reference is not None:
+            self.replies[int(reference["message_id"])].put_nowait(data)
+        return data
+
+    async def add_reaction(self, channel_id, message_id, emoji):
+        route = discord.http.Route("PUT", "/channels/{channel_id}/messages/{message_id}/reactions/{emoji}/@me", channel_id=channel_id, message_id=message_id, emoji=emoji)
+        return await self.request(route, respond=lambda: None)
+
+    async def get_channel(self, channel_id):
+        return await self.request(discord.http.Route("GET", "/channels/{channel_id}", channel_id=channel_id), respond=lambda: channel_payload(int(channel_id)))
+
+    async def get_user(self, user_id):
+        return await self.request(discord.http.Route("GET", "/users/{user_id}", user_id=user_id), respond=lambda: user_payload(user_id))
+
+    async def start_private_message(self, user_id):
+        return await self.request(discord.http.Route("POST", "/users/@me/channels"), respond=lambda: {"id": str(user_id), "type": 1, "recipients": [user_payload(user_id)], "last_message_id": None})
+
+def channel_payload(channel_id):
+    if channel_id in (LOG_CHANNEL_ID, SUGGESTION_CHANNEL_ID, COMPLAINT_CHANNEL_ID):
+        return {"id": str(channel_id), "type": 0, "guild_id": str(GUILD_ID), "name": f"channel{channel_id}", "position": 0, "permission_overwrites": []}
+    return {"id": str(channel_id), "type": 1, "recipients": [user_payload(channel_id)], "last_message_id": None}
+
+#Feeds gateway events into the bot's connection state exactly as the websocket would
+class FakeGateway:
+    def __init__(self, client):
+        self.client = client
+        self.state = client._connection
+        self.http = FakeHTTP()
+
+    async def connect(self):
+        self.client.http = self.http
+        self.state.http = self.http
+        #The bot wrapped its real HTTP client at import, so the fake needs the same wrapper for its API calls to be counted
+        bot.count_api_calls(self.http)
+        await self.client._async_setup_hook()
+        await bot.load_cogs()
+        self.state.user = discord.ClientUser(state=self.state, data=user_payload(BOT_ID))
+
+    #Users talk to the bot in DMs, whose channel ID is the user's ID
+    def message(self, authorID, content):
+        data = message_payload(next(snowflakes), authorID, authorID, content)
+        self.state.parse_message_create(data)
+        return int(data["id"])
+
+    def reaction(self, userID, channelID, messageID, emoji):
+        self.state.parse_message_reaction_add({
+            "user_id": str(userID),
+            "channel_id": str(channelID),
+            "message_id": str(messageID),
+            "guild_id": str(GUILD_ID),
+            "emoji": {"id": None, "name": emoji},
+            "type": 0,
+        })
+
+#endregion
+
+#region Simulation
+
+class Statistics:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.outcomes = defaultdict(lambda: defaultdict(int))
+        self.lost = 0
+        self.errors = {}
+
+    def summary(self, elapsed):
+        commands = {}
+        for command, latencies in sorted(self.latencies.items()):
+            latencies = [latency * 1000 for latency in latencies]
+            percentiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+            commands[command] = {
+                "count": len(latencies),
+                "p50_ms": round(percentiles[49], 2),
+                "p95_ms": round(percentiles[94], 2),
+                "p99_ms": round(percentiles[98], 2),
+                "max_ms": round(max(latencies), 2),
+                "outcomes": dict(self.outcomes[command]),
+            }
+        total = sum(len(latencies) for latencies in self.latencies.values())
+        return {
+            "commands": total,
+            "seconds": round(elapsed, 3),
+            "throughput_per_second": round(total / elapsed, 2) if elapsed > 0 else None,
+            "lost_replies": self.lost,
+            "command_errors": self.errors,
+            "by_command": commands,
+        }
+
+class Simulation:
+    def __init__(self, gateway, users, rng):
+        self.gateway = gateway
+        self.users = users
+        self.rng = rng
+        self.stats = Statistics()
+        #What each account should hold according to the replies users saw
+        self.expected = {}
+        self.running = True
+
+    #Sends a command and waits for its reply; commands queued for approval wait for the outcome as well
+    async def send(self, userID, name, content):
+        start = time.perf_counter()
+        messageID = self.gateway.message(userID, content)
+        replies = self.gateway.http.replies[messageID]
+        try:
+            reply = await asyncio.wait_for(replies.get(), arguments.timeout)
+            if reply["content"].startswith("Awaiting approval"):
+                reply = await asyncio.wait_for(replies.get(), arguments.timeout)
+        except asyncio.TimeoutError:
+            self.stats.lost += 1
+            return None
+        finally:
+            self.gateway.http.replies.pop(messageID, None)
+
+        self.stats.latencies[name].append(time.perf_counter() - start)
+        outcome = reply["content"] or "embed"
+        self.stats.outcomes[name][re.sub(r"user\d+", "<account>", outcome)[:80]] += 1
+        return outcome
+
+    def credit(self, account, amount):
+        self.expected[account] += amount
+
+    async def user(self, index):
+        userID = 100000 + index
+        account = f"user{index}"
+        await self.send(userID, "login", f"{bot.prefix}login {account} {PASSWORD}")
+
+        for _ in range(arguments.commands):
+            if arguments.think > 0:
+                await asyncio.sleep(self.rng.uniform(0, arguments.think))
+            choice = self.rng.random()
+            amount = Money.denars(self.rng.randint(1, 20))
+
+            if choice < 0.25:
+                if await self.send(userID, "deposit", f"{bot.prefix}deposit {amount} atm") == "Deposit Completed":
+                    self.credit(account, amount)
+            elif choice < 0.45:
+                if await self.send(userID, "withdraw", f"{bot.prefix}withdraw {amount} atm") == "Withdraw Completed":
+                    self.credit(account, -amount)
+            elif choice < 0.70:
+                recipient = f"user{self.rng.randrange(self.users)}"
+                if await self.send(userID, "transfer", f"{bot.prefix}transfer {recipient} {amount}") == "Transfer Completed":
+                    self.credit(account, -amount)
+                    self.credit(recipient, amount)
+            elif choice < 0.80:
+                if await self.send(userID, "payLoan", f"{bot.prefix}payLoan {index+1} {amount}") == "Loan Payment Completed":
+                    self.credit(account, -amount)
+                    self.credit('IMC', amount)
+            elif choice < 0.85:
+                if await self.send(userID, "buyLotteryTicket", f"{bot.prefix}buyLotteryTicket") == "Ticket Purchased":
+                    profit = bot.TICKET_COST.share(bot.PERCENT_PROFIT)
+                    self.credit(account, -bot.TICKET_COST)
+                    self.credit('Lottery', bot.TICKET_COST - profit)
+                    self.credit('IMC', profit)
+            else:
+                await self.send(userID, "bal", f"{bot.prefix}bal")
+
+    #Plays the bank staff, reacting to every approval request as it appears in the log channel
+    async def admin(self):
+        handled = set()
+        while self.running:
+            for messageID in list(bot.pendingApprovals):
+                if messageID not in handled:
+                    handled.add(messageID)
+                    emoji = '❌' if self.rng.random() < arguments.deny else '✅'
+                    self.gateway.reaction(ADMIN_ID, LOG_CHANNEL_ID, messageID, emoji)
+            await asyncio.sleep(0.01)
+
+#endregion
+
+#region Setup Data
+
+#Every account gets one loan with no minimum payment, so payLoan always has something to pay
+#Daily limits are low enough that busy users go over them and exercise the approval flow
+def seed(connection, users):
+    balance = Money.denars(1000)
+    limit = Money.denars(50)
+    with bot.transaction(connection):
+        testbed.seed_accounts(bot, connection, PASSWORD, ((f"user{i}", "Checking", balance, limit) for i in range(users)))
+        connection.executemany(
+            "INSERT INTO loans (id, accountName, interestRate, originalAmount, amountRemaining, discordID, payPercent, lateFee, paid) VALUES (?, ?, 0.05, ?, ?, ?, 0, 0, 0)",
+            ((i+1, f"user{i}", Money.denars(10**6), Money.denars(10**6), str(100000 + i)) for i in range(users))
+        )
+        connection.execute("UPDATE accounts SET money = ? WHERE name IN ('IMC', 'Lottery')", (Money.denars(10**6),))
+
+def balances(connection):
+    return dict(connection.execute("SELECT name, money FROM accounts").fetchall())
+
+#Every balance change the bot makes is recorded in the ledger in the same transaction
+def ledger_totals(connection):
+    return dict(connection.execute("SELECT accountName, sum(amount) FROM transactions GROUP BY accountName").fetchall())
+
+#Deposits and withdrawals are the only operations that move money into or out of the bank
+def external_flow(connection):
+    return connection.execute("SELECT coalesce(sum(amount), 0) FROM transactions WHERE type IN ('deposit', 'withdraw')").fetchone()[0]
+
+#Lost updates compare balances with what users were told; the ledger and conservation checks hold whether or not a reply arrived
+def check_invariants(before, after, expected, ledger, external):
+    lostUpdates = {name: {"expected": expected[name], "actual": after.get(name, 0) - before[name]} for name in before if after.get(name, 0) - before[name] != expected[name]}
+    ledgerMismatches = {name: {"ledger": ledger.get(name, 0), "actual": after.get(name, 0) - before[name]} for name in before if after.get(name, 0) - before[name] != ledger.get(name, 0)}
+    return {
+        "negative_balances": sorted(name for name, money in after.items() if money < 0),
+        "lost_updates": lostUpdates,
+        "ledger_mismatches": ledgerMismatches,
+        "money_conserved": sum(after.values()) - sum(before.values()) == external,
+        "total_before": str(Money(sum(before.values()))),
+        "total_after": str(Money(sum(after.values()))),
+    }
+
+#endregion
+
+#region Main
+
+async def simulate():
+    rng = random.Random(arguments.seed)
+    gateway = FakeGateway(bot.bot)
+    await gateway.connect()
+
+    errors = defaultdict(int)
+    async def on_command_error(ctx, error):
+        errors[repr(getattr(error, "original", error))[:200]] += 1
+    bot.bot.add_listener(on_command_error, "on_command_error")
+
+    await bot.database.run(seed, arguments.users)
+    before = await bot.database.run(balances)
+
+    simulation = Simulation(gateway, arguments.users, rng)
+    simulation.expected = defaultdict(int, {name: 0 for name in before})
+    admin = asyncio.create_task(simulation.admin())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(simulation.user(index) for index in range(arguments.users)))
+    elapsed = time.perf_counter() - start
+
+    simulation.running = False
+    await admin
+    await bot.auditLog.drain()
+
+    after = await bot.database.run(balances)
+    ledger = await bot.database.run(ledger_totals)
+    external = await bot.database.run(external_flow)
+    simulation.stats.errors = dict(errors)
+
+    return {
+        "config": {
+            "users": arguments.users,
+            "commands_per_user": arguments.commands,
+            "think_seconds": arguments.think,
+            "deny_fraction": arguments.deny,
+            "scrypt_n": arguments.scrypt_n,
+            "seed": arguments.seed,
+        },
+        "results": simulation.stats.summary(elapsed),
+        "http_requests": gateway.http.requests,
+        "bot_metrics": bot.metrics.summary()[0],
+        "invariants": check_invariants(before, after, simulation.expected, ledger, external),
+    }
+
+def main():
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(simulate())
+    shutil.rmtree(directory, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if arguments.output is None:
+        print(output)
+    else:
+        with open(arguments.output, "w") as file:
+            file.write(output + "\n")
+
+    invariants = report["invariants"]
+    if invariants["lost_updates"] or invariants["ledger_mismatches"] or invariants["negative_balances"] or not invariants["money_conserved"] or report["results"]["lost_replies"]:
+        sys.exit(1)
+
+#endregion
+
+if __name__ == "__main__":
+    main()
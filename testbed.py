@@ -0,0 +1,32 @@
+# testbed.py
+# Shared setup for benchmark.py and loadtest.py: imports the bot against a throwaway database and seeds it with accounts
+import contextlib
+import importlib
+import os
+import sys
+import tempfile
+
+#The bot reads its configuration at import time, so point it at a throwaway database first
+#The system accounts get the same password as the seeded ones, and anything else the script needs is passed in settings
+#Returns the bot module and the temporary directory to remove afterwards
+def import_bot(prefix, password, settings=None):
+    directory = tempfile.mkdtemp(prefix=prefix)
+    os.environ["DB_PATH"] = os.path.join(directory, "bank.db")
+    os.environ.update(settings or {})
+    os.environ.setdefault("IMC_PASSWORD", password)
+    os.environ.setdefault("LOTTERY_PASSWORD", password)
+    os.environ.setdefault("ADMINS", "")
+
+    #The bot logs to stdout, which is reserved for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        bot = importlib.import_module("bot")
+    return bot, directory
+
+#Every account shares one hash; hashing thousands of passwords would take longer than the run itself
+#Each account is (name, type, money, limit), with the limit used for withdrawals, deposits and transfers alike
+def seed_accounts(bot, connection, password, accounts):
+    hashed = bot.hash_password(password)
+    connection.executemany(
+        "INSERT INTO accounts (name, password, type, money, interestRate, maxWithdraw, maxDeposit, maxTransfer, creditScore, amountWithdrew, amountDeposited, amountTransferred) VALUES (?, ?, ?, ?, 0.02, ?, ?, ?, 3, 0, 0, 0)",
+        ((name, hashed, type, money, limit, limit, limit) for name, type, money, limit in accounts)
+    )